@@ -0,0 +1,48 @@
+"""sources unique url and content hash
+
+Revision ID: 3b8f2d9a41c6
+Revises: ef7cb9c165fb
+Create Date: 2026-10-18 09:12:44.120381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8f2d9a41c6'
+down_revision: Union[str, None] = 'ef7cb9c165fb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Collapse duplicated urls onto their oldest source before adding the unique constraint
+    op.execute("""
+        CREATE TEMPORARY TABLE duplicate_sources ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, min(id) OVER (PARTITION BY url) AS keep_id FROM sources
+        ) s
+        WHERE id <> keep_id;
+    """)
+    op.execute("""
+        UPDATE iocs SET source_id = d.keep_id
+        FROM duplicate_sources d
+        WHERE iocs.source_id = d.id;
+    """)
+    op.execute("DELETE FROM source_embeddings WHERE source_id IN (SELECT id FROM duplicate_sources);")
+    op.execute("DELETE FROM sources WHERE id IN (SELECT id FROM duplicate_sources);")
+
+    op.add_column('sources', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.execute("UPDATE sources SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex');")
+
+    op.drop_index(op.f('ix_sources_url'), table_name='sources')
+    op.create_index(op.f('ix_sources_url'), 'sources', ['url'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sources_url'), table_name='sources')
+    op.create_index(op.f('ix_sources_url'), 'sources', ['url'], unique=False)
+    op.drop_column('sources', 'content_hash')
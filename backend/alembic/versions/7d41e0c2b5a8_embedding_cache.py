@@ -0,0 +1,34 @@
+"""embedding cache
+
+Revision ID: 7d41e0c2b5a8
+Revises: 3b8f2d9a41c6
+Create Date: 2026-10-18 10:03:17.552904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '7d41e0c2b5a8'
+down_revision: Union[str, None] = '3b8f2d9a41c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_cache',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(dim=1536), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('content_hash', 'model')
+    )
+    op.create_index('ix_embedding_cache_created_at', 'embedding_cache', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_embedding_cache_created_at', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
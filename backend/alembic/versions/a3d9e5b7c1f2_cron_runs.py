@@ -0,0 +1,30 @@
+"""cron runs
+
+Revision ID: a3d9e5b7c1f2
+Revises: f4a7c1d9b2e6
+Create Date: 2026-10-18 15:11:04.286390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e5b7c1f2'
+down_revision: Union[str, None] = 'f4a7c1d9b2e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cron_runs',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_fired_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('cron_runs')
@@ -0,0 +1,44 @@
+"""enrichment work items
+
+Revision ID: b6e1f4a8d3c7
+Revises: a3d9e5b7c1f2
+Create Date: 2026-10-18 15:48:22.903517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1f4a8d3c7'
+down_revision: Union[str, None] = 'a3d9e5b7c1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('enrichment_work_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('enrichment_job_id', sa.Integer(), nullable=False),
+    # The jobstatus type is shared with enrichment_jobs
+    sa.Column('status', postgresql.ENUM('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='jobstatus', create_type=False), nullable=False),
+    sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('recrawl', sa.Boolean(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['enrichment_job_id'], ['enrichment_jobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_enrichment_work_items_enrichment_job_id'), 'enrichment_work_items', ['enrichment_job_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_enrichment_work_items_enrichment_job_id'), table_name='enrichment_work_items')
+    op.drop_table('enrichment_work_items')
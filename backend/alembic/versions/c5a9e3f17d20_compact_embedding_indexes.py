@@ -0,0 +1,33 @@
+"""compact embedding index
+
+Revision ID: c5a9e3f17d20
+Revises: 7d41e0c2b5a8
+Create Date: 2026-10-18 11:26:05.874213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3f17d20'
+down_revision: Union[str, None] = '7d41e0c2b5a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Half precision (2 bytes per dimension) HNSW index replacing the full precision one, searches
+    # re-rank its candidates against the full precision embeddings. Only one HNSW graph is kept in memory.
+    op.execute("""
+        CREATE INDEX sources_embedding_halfvec_idx ON source_embeddings
+        USING hnsw ((CAST(embedding AS halfvec(1536))) halfvec_cosine_ops)
+        WITH (m = 16, ef_construction = 200);
+    """)
+    op.drop_index('sources_embedding_idx', table_name='source_embeddings', postgresql_using='hnsw', postgresql_ops={'embedding': 'public.vector_cosine_ops'}, postgresql_with={'m': '16', 'ef_construction': '200'})
+
+
+def downgrade() -> None:
+    op.create_index('sources_embedding_idx', 'source_embeddings', ['embedding'], unique=False, postgresql_using='hnsw', postgresql_ops={'embedding': 'public.vector_cosine_ops'}, postgresql_with={'m': '16', 'ef_construction': '200'})
+    op.drop_index('sources_embedding_halfvec_idx', table_name='source_embeddings')
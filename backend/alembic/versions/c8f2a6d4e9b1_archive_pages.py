@@ -0,0 +1,35 @@
+"""archive pages
+
+Revision ID: c8f2a6d4e9b1
+Revises: b6e1f4a8d3c7
+Create Date: 2026-10-18 16:32:45.170623
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2a6d4e9b1'
+down_revision: Union[str, None] = 'b6e1f4a8d3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('archive_pages',
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('urls', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('fetched_on', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('url')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('archive_pages')
@@ -0,0 +1,31 @@
+"""sources keyset pagination indexes
+
+Revision ID: e2b6d8a0f3c4
+Revises: c5a9e3f17d20
+Create Date: 2026-10-18 12:41:52.306117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6d8a0f3c4'
+down_revision: Union[str, None] = 'c5a9e3f17d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sources_published_on_id', 'sources', ['published_on', 'id'], unique=False)
+    op.create_index('ix_sources_updated_on_id', 'sources', ['updated_on', 'id'], unique=False)
+    op.create_index('ix_sources_fetched_on_id', 'sources', ['fetched_on', 'id'], unique=False)
+    op.create_index('ix_sources_title_id', 'sources', ['title', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sources_title_id', table_name='sources')
+    op.drop_index('ix_sources_fetched_on_id', table_name='sources')
+    op.drop_index('ix_sources_updated_on_id', table_name='sources')
+    op.drop_index('ix_sources_published_on_id', table_name='sources')
@@ -0,0 +1,43 @@
+"""sources full-text search
+
+Revision ID: f4a7c1d9b2e6
+Revises: e2b6d8a0f3c4
+Create Date: 2026-10-18 14:02:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a7c1d9b2e6'
+down_revision: Union[str, None] = 'e2b6d8a0f3c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('sources', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_sources_search_vector', 'sources', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_sources_title_trgm', 'sources', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_sources_content_trgm', 'sources', ['content'], unique=False, postgresql_using='gin', postgresql_ops={'content': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sources_content_trgm', table_name='sources')
+    op.drop_index('ix_sources_title_trgm', table_name='sources')
+    op.drop_index('ix_sources_search_vector', table_name='sources')
+    op.drop_column('sources', 'search_vector')
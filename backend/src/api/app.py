@@ -46,6 +46,7 @@ if config.environment == "development":
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count"],
         allow_credentials=True,
     )
 
@@ -1,14 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Annotated, Literal
+from typing import Annotated, AsyncIterator, Literal
 from datetime import datetime
+import csv
+import io
+import json
 
 from src.api.dependencies import get_db
+from src.db.database import SessionLocal
 from src.db import schemas, crud
+from src.db.pagination import json_default
+from src.config import config
+from src.utils.embeddings import async_get_query_embedding
 
 router = APIRouter()
 
+SourceField = Literal[
+    "id",
+    "title",
+    "type",
+    "url",
+    "content",
+    "published_on",
+    "updated_on",
+    "fetched_on",
+    "enrichment_job_id",
+]
+
 
 @router.get(
     "",
@@ -18,6 +39,7 @@ router = APIRouter()
 )
 async def get_source_endpoint(
     db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
     content_like: str | None = Query(
         default=None,
         description="Filter sources by content",
@@ -38,6 +60,14 @@ async def get_source_endpoint(
         default=None,
         description="Filter sources published before this date",
     ),
+    updated_after: datetime | None = Query(
+        default=None,
+        description="Filter sources updated after this date",
+    ),
+    updated_before: datetime | None = Query(
+        default=None,
+        description="Filter sources updated before this date",
+    ),
     order_by: Literal[
         "id",
         "title",
@@ -65,26 +95,161 @@ async def get_source_endpoint(
         le=1_000,
         description="Limit the number of sources returned",
     ),
+    cursor: str | None = Query(
+        default=None,
+        description="Return the page after this cursor, taken from the X-Next-Cursor header of the previous page. Replaces offset. Only when ordering by id, title, published_on, updated_on or fetched_on.",
+    ),
+    fields: list[SourceField] | None = Query(
+        default=None,
+        description="Only return these fields (the id is always included)",
+    ),
+    summary: bool = Query(
+        default=False,
+        description="Return summaries without the content, shorthand for the fields of SourceSummary",
+    ),
+    total: Literal["none", "exact", "estimated"] = Query(
+        default="none",
+        description="Return the number of sources matching the filters in the X-Total-Count header, estimated from the planner statistics or exact",
+    ),
 ) -> list[schemas.Source]:
 
     """
     Get sources from the database.
+    When a full page ordered by an indexed column is returned, the X-Next-Cursor response header holds the cursor of the next page.
+    With `total`, the X-Total-Count response header holds the number of sources matching the filters.
     """
-    sources = await crud.async_base_get_source(
-        db=db,
+    if summary and not fields:
+        fields = list(schemas.SourceSummary.model_fields)
+    if fields:
+        # The id and the order column are needed for the next cursor
+        fields = list(dict.fromkeys(["id", *fields]))
+        loaded_fields = list(dict.fromkeys([*fields, order_by]))
+    else:
+        loaded_fields = None
+
+    query = dict(
         content_like=content_like,
         title_like=title_like,
         url=url,
         published_after=published_after,
         published_before=published_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
         order_by=order_by,
         asc=asc,
         offset=offset,
         limit=limit,
+        cursor=cursor,
+        fields=loaded_fields,
     )
+    try:
+        if total == "none":
+            sources = await crud.async_base_get_source(db=db, **query)
+        else:
+            sources, count = await crud.async_get_sources_with_total(db=db, total=total, **query)
+            response.headers["X-Total-Count"] = str(count)
+    except crud.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(sources) == limit and order_by in crud.source_cursor_columns:
+        response.headers["X-Next-Cursor"] = crud.encode_source_cursor(sources[-1], order_by, asc)
+
+    if fields:
+        # Projected rows are serialized as they are, without a round trip through schemas.Source
+        return JSONResponse(
+            content=jsonable_encoder([
+                {field: getattr(source, field) for field in fields}
+                for source in sources
+            ]),
+            headers=dict(response.headers),
+        )
     return sources
 
 
+async def _export_sources(format: str, fields: list[str], **kwargs) -> AsyncIterator[str]:
+    # The request scoped session is closed before the response body is sent, the export opens its own
+    async with SessionLocal() as db:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            async for batch in crud.async_stream_sources(db=db, fields=fields, **kwargs):
+                writer.writerows(batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            async for batch in crud.async_stream_sources(db=db, fields=fields, **kwargs):
+                yield "".join(json.dumps(row, default=json_default) + "\n" for row in batch)
+
+@router.get("/export")
+async def export_sources_endpoint(
+    format: Literal["ndjson", "csv"] = Query(
+        default="ndjson",
+        description="Newline delimited JSON or CSV with a header row",
+    ),
+    content_like: str | None = Query(default=None, description="Filter sources by content"),
+    url: str | None = Query(default=None, description="Filter sources by URL"),
+    title_like: str | None = Query(default=None, description="Filter sources by title"),
+    published_after: datetime | None = Query(default=None, description="Filter sources published after this date"),
+    published_before: datetime | None = Query(default=None, description="Filter sources published before this date"),
+    updated_after: datetime | None = Query(default=None, description="Filter sources updated after this date"),
+    updated_before: datetime | None = Query(default=None, description="Filter sources updated before this date"),
+    order_by: Literal[
+        "id",
+        "title",
+        "url",
+        "published_on",
+        "updated_on",
+        "fetched_on",
+    ] = Query(
+        default="id",
+        description="Order by this field",
+    ),
+    asc: bool = Query(
+        default=True,
+        description="Order by ascending",
+    ),
+    fields: list[SourceField] | None = Query(
+        default=None,
+        description="Only export these fields, all of them by default",
+    ),
+    summary: bool = Query(
+        default=False,
+        description="Export summaries without the content, shorthand for the fields of SourceSummary",
+    ),
+) -> StreamingResponse:
+    """
+    Export every source matching the filters, streamed from a server-side cursor.
+    Unlike the list endpoint the export is not paginated and its memory use does not grow with the number of sources.
+    """
+    if summary and not fields:
+        fields = list(schemas.SourceSummary.model_fields)
+    fields = list(dict.fromkeys(fields or crud.source_columns))
+
+    body = _export_sources(
+        format,
+        fields,
+        order_by=order_by,
+        asc=asc,
+        batch_size=config.source_export_batch_size,
+        content_like=content_like,
+        title_like=title_like,
+        url=url,
+        published_after=published_after,
+        published_before=published_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
+    )
+    return StreamingResponse(
+        body,
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="sources.{format}"'},
+    )
+
+
 @router.get("/count")
 async def count_sources_endpoint(
     db: Annotated[AsyncSession, Depends(get_db)],
@@ -93,13 +258,119 @@ async def count_sources_endpoint(
     title_like: str | None = Query(default=None, description="Filter sources by title"),
     published_after: datetime | None = Query(default=None, description="Filter sources published after this date"),
     published_before: datetime | None = Query(default=None, description="Filter sources published before this date"),
+    updated_after: datetime | None = Query(default=None, description="Filter sources updated after this date"),
+    updated_before: datetime | None = Query(default=None, description="Filter sources updated before this date"),
+    estimated: bool = Query(default=False, description="Estimate the count from the planner statistics instead of counting"),
 ) -> dict:
-    count = await crud.async_count_sources(
-        db=db,
+    filters = dict(
         content_like=content_like,
         title_like=title_like,
         url=url,
         published_after=published_after,
         published_before=published_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
+    )
+    if estimated:
+        count = await crud.async_estimate_count_sources(db=db, **filters)
+    else:
+        count = await crud.async_count_sources(db=db, **filters)
+    return {"count": count, "estimated": estimated}
+
+
+@router.get("/search")
+async def search_sources_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    query: str = Query(
+        min_length=1,
+        description="Find sources similar to this text",
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=100,
+        description="Limit the number of sources returned",
+    ),
+    profile: Literal["fast", "balanced", "accurate"] = Query(
+        default=config.vector_search_profile,
+        description="Recall/latency trade-off of the vector index scan",
+    ),
+) -> list[schemas.SourceWithDistance]:
+    """
+    Similarity search over the source embeddings, closest sources first.
+    """
+    query_embedding = await async_get_query_embedding(query)
+    sources = await crud.async_similarity_search_sources(
+        db=db,
+        query_embedding=query_embedding,
+        limit=limit,
+        profile=profile,
+    )
+    return [schemas.SourceWithDistance(**source) for source in sources]
+
+
+@router.get("/search/keyword")
+async def keyword_search_sources_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    query: str = Query(
+        min_length=1,
+        description='Keywords to look for, supports "quoted phrases", OR and -excluded terms',
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=100,
+        description="Limit the number of sources returned",
+    ),
+    offset: int = Query(
+        default=0,
+        ge=0,
+        description="Skip the first n matches",
+    ),
+) -> list[schemas.SourceSearchResult]:
+    """
+    Full-text search over the title and content of the sources, best match first.
+    Each result carries its rank and a snippet of the content with the matches wrapped in <mark> tags.
+    """
+    sources = await crud.async_fulltext_search_sources(
+        db=db,
+        query=query,
+        limit=limit,
+        offset=offset,
+    )
+    return [schemas.SourceSearchResult(**source) for source in sources]
+
+
+@router.get("/search/hybrid")
+async def hybrid_search_sources_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    # A second session, the keyword and vector queries run concurrently
+    vector_db: Annotated[AsyncSession, Depends(get_db, use_cache=False)],
+    query: str = Query(
+        min_length=1,
+        description="Keywords, IOCs or free text to look for",
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=100,
+        description="Limit the number of sources returned",
+    ),
+    profile: Literal["fast", "balanced", "accurate"] = Query(
+        default=config.vector_search_profile,
+        description="Recall/latency trade-off of the vector index scan",
+    ),
+) -> list[schemas.SourceHybridResult]:
+    """
+    Hybrid search, full-text and similarity search fused with reciprocal rank fusion, best match first.
+    """
+    query_embedding = await async_get_query_embedding(query)
+    sources = await crud.async_hybrid_search_sources(
+        keyword_db=db,
+        vector_db=vector_db,
+        query=query,
+        query_embedding=query_embedding,
+        limit=limit,
+        profile=profile,
     )
-    return {"count": count}
+    return [schemas.SourceHybridResult(**source) for source in sources]
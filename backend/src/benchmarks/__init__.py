@@ -0,0 +1 @@
+"""Benchmarks, run them with `python -m src.benchmarks.<name>` against a running database"""
@@ -0,0 +1,156 @@
+"""
+Recall@k and latency of the HNSW indexes per vector search profile, measured against exact search.
+
+Each dataset size is loaded into a temporary table of random unit vectors with the same indexes as
+`source_embeddings` (full precision, halfvec and binary quantized), so the benchmark never touches
+stored sources. Compact indexes are re-ranked exactly like `crud.async_similarity_search_sources` does.
+
+    python -m src.benchmarks.hnsw_recall --sizes 1000 10000 50000 --queries 50 --k 10 --indexes vector halfvec binary
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.config import config
+from src.db import crud
+from src.db.database import engine
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+index_definitions = {
+    "vector": "(embedding vector_cosine_ops)",
+    "halfvec": "((CAST(embedding AS halfvec({dimensions}))) halfvec_cosine_ops)",
+    "binary": "((CAST(binary_quantize(embedding) AS bit({dimensions}))) bit_hamming_ops)",
+}
+
+index_orderings = {
+    "vector": "embedding <=> CAST(:query AS vector)",
+    "halfvec": "CAST(embedding AS halfvec({dimensions})) <=> CAST(:query AS halfvec({dimensions}))",
+    "binary": "CAST(binary_quantize(embedding) AS bit({dimensions})) <~> binary_quantize(CAST(:query AS vector))",
+}
+
+
+async def load_dataset(conn: AsyncConnection, size: int, dimensions: int, indexes: list[str]) -> None:
+    await conn.execute(text("DROP TABLE IF EXISTS bench_vectors"))
+    await conn.execute(text(f"CREATE TEMPORARY TABLE bench_vectors (id serial PRIMARY KEY, embedding vector({dimensions}))"))
+    # The inner query references g so that Postgres draws a new vector per row
+    await conn.execute(
+        text(f"""
+            INSERT INTO bench_vectors (embedding)
+            SELECT l2_normalize((SELECT array_agg(random() - 0.5 + g * 0) FROM generate_series(1, {dimensions}))::vector)
+            FROM generate_series(1, :size) g
+        """),
+        {"size": size},
+    )
+    for index in indexes:
+        definition = index_definitions[index].format(dimensions=dimensions)
+        await conn.execute(text(
+            f"CREATE INDEX ON bench_vectors USING hnsw {definition} WITH (m = 16, ef_construction = 200)"
+        ))
+    await conn.execute(text("ANALYZE bench_vectors"))
+    await conn.commit()
+
+
+async def random_queries(conn: AsyncConnection, count: int, dimensions: int) -> list[str]:
+    res = await conn.execute(
+        text(f"""
+            SELECT l2_normalize((SELECT array_agg(random() - 0.5 + g * 0) FROM generate_series(1, {dimensions}))::vector)::text
+            FROM generate_series(1, :count) g
+        """),
+        {"count": count},
+    )
+    return [row[0] for row in res.all()]
+
+
+async def search(
+    conn: AsyncConnection,
+    query: str,
+    k: int,
+    dimensions: int,
+    profile: str | None,
+    index: str = "vector",
+) -> tuple[list[int], float]:
+    rerank_factor = config.vector_rerank_factor if index != "vector" else 1
+    async with conn.begin():
+        if profile is None:
+            # Exact search, keep the planner away from the indexes
+            await conn.execute(text("SET LOCAL enable_indexscan = off"))
+        else:
+            await crud.async_apply_vector_search_profile(conn, profile, min_ef_search=k * rerank_factor)
+        ordering = index_orderings[index].format(dimensions=dimensions)
+        start = time.perf_counter()
+        res = await conn.execute(
+            text(f"""
+                WITH candidates AS (
+                    SELECT id, embedding FROM bench_vectors ORDER BY {ordering} LIMIT :candidates
+                )
+                SELECT id FROM candidates ORDER BY embedding <=> CAST(:query AS vector) LIMIT :k
+            """),
+            {"query": query, "k": k, "candidates": k * rerank_factor},
+        )
+        ids = [row[0] for row in res.all()]
+        elapsed = time.perf_counter() - start
+    return ids, elapsed
+
+
+async def run(
+    sizes: list[int],
+    queries: int,
+    k: int,
+    dimensions: int,
+    profiles: list[str],
+    indexes: list[str],
+) -> None:
+    print(f"{'size':>8} {'index':>8} {'profile':>10} {'recall@' + str(k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    async with engine.connect() as conn:
+        for size in sizes:
+            await load_dataset(conn, size, dimensions, indexes)
+            query_vectors = await random_queries(conn, queries, dimensions)
+            await conn.commit()
+
+            exact: list[list[int]] = []
+            exact_latencies: list[float] = []
+            for query in query_vectors:
+                ids, elapsed = await search(conn, query, k, dimensions, None)
+                exact.append(ids)
+                exact_latencies.append(elapsed * 1000)
+            print(f"{size:>8} {'-':>8} {'exact':>10} {1.0:>10.3f} {statistics.median(exact_latencies):>8.2f} {percentile(exact_latencies, 0.95):>8.2f}")
+
+            for index in indexes:
+                for profile in profiles:
+                    recalls: list[float] = []
+                    latencies: list[float] = []
+                    for query, truth in zip(query_vectors, exact):
+                        ids, elapsed = await search(conn, query, k, dimensions, profile, index)
+                        recalls.append(len(set(ids) & set(truth)) / max(1, len(truth)))
+                        latencies.append(elapsed * 1000)
+                    print(f"{size:>8} {index:>8} {profile:>10} {statistics.mean(recalls):>10.3f} {statistics.median(latencies):>8.2f} {percentile(latencies, 0.95):>8.2f}")
+
+        await conn.execute(text("DROP TABLE IF EXISTS bench_vectors"))
+        await conn.commit()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimensions", type=int, default=config.embedding_dimensions)
+    parser.add_argument("--profiles", nargs="+", default=list(crud.vector_search_profiles))
+    parser.add_argument("--indexes", nargs="+", choices=list(index_definitions), default=["vector"])
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.queries, args.k, args.dimensions, args.profiles, args.indexes))
+
+
+if __name__ == "__main__":
+    main()
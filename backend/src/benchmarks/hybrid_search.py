@@ -0,0 +1,120 @@
+"""
+Recall@k, MRR and latency of the hybrid search against the vector-only and keyword-only searches.
+
+Queries are IOC-like tokens (IPv4 addresses, MD5/SHA1/SHA256 hashes and domains) sampled from the
+stored sources, a source is relevant to a query when its title or content contains the token. Query
+embeddings are computed with the configured embedding provider before timing, so latencies only cover
+the database round trips. The `stub` provider works offline.
+
+    python -m src.benchmarks.hybrid_search --queries 100 --k 10 --profiles fast balanced
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+from src.config import config
+from src.db import crud
+from src.db.database import SessionLocal, engine
+from src.utils.embeddings import async_get_query_embedding
+from src.benchmarks.hnsw_recall import percentile
+
+
+ioc_patterns = {
+    "ipv4": r"\m(?:\d{1,3}\.){3}\d{1,3}\M",
+    "sha256": r"\m[0-9a-fA-F]{64}\M",
+    "sha1": r"\m[0-9a-fA-F]{40}\M",
+    "md5": r"\m[0-9a-fA-F]{32}\M",
+    "domain": r"\m[a-z0-9-]+\.(?:com|net|org|ru|cn|info|xyz|top)\M",
+}
+
+
+async def sample_queries(count: int, kinds: list[str]) -> list[tuple[str, set[int]]]:
+    """
+    Sample up to `count` distinct IOC tokens from the sources, spread over `kinds`, with the ids of
+    the sources that contain them.
+    """
+    per_kind = max(1, count // len(kinds))
+    queries: list[tuple[str, set[int]]] = []
+    async with SessionLocal() as db:
+        for kind in kinds:
+            res = await db.execute(
+                text("""
+                    SELECT token FROM (
+                        SELECT DISTINCT (regexp_matches(content, :pattern, 'g'))[1] AS token FROM sources
+                    ) tokens
+                    ORDER BY random()
+                    LIMIT :limit
+                """),
+                {"pattern": f"({ioc_patterns[kind]})", "limit": per_kind},
+            )
+            for (token,) in res.all():
+                relevant = await db.execute(
+                    text("SELECT id FROM sources WHERE strpos(title, :token) > 0 OR strpos(content, :token) > 0"),
+                    {"token": token},
+                )
+                queries.append((token, {row[0] for row in relevant.all()}))
+    return queries[:count]
+
+
+async def search(method: str, query: str, query_embedding: list[float], k: int, profile: str) -> tuple[list[int], float]:
+    async with SessionLocal() as db, SessionLocal() as vector_db:
+        start = time.perf_counter()
+        if method == "vector":
+            rows = await crud.async_similarity_search_sources(
+                db, query_embedding, limit=k, columns=("id",), profile=profile,
+            )
+        elif method == "keyword":
+            rows = await crud.async_fulltext_search_sources(
+                db, query, limit=k, columns=("id",), snippets=False,
+            )
+        else:
+            rows = await crud.async_hybrid_search_sources(
+                db, vector_db, query, query_embedding, limit=k, columns=("id",), profile=profile,
+            )
+        elapsed = time.perf_counter() - start
+        await db.rollback()
+        await vector_db.rollback()
+    return [row["id"] for row in rows], elapsed
+
+
+async def run(queries: int, k: int, profiles: list[str], kinds: list[str]) -> None:
+    sampled = await sample_queries(queries, kinds)
+    if not sampled:
+        print("No IOC-like tokens found in the sources, run an enrichment job first")
+        await engine.dispose()
+        return
+    embeddings = [await async_get_query_embedding(query) for query, _ in sampled]
+    print(f"{len(sampled)} queries, embedding provider {config.embedding_provider}")
+
+    print(f"{'method':>8} {'profile':>10} {'recall@' + str(k):>10} {'MRR':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for method in ("vector", "keyword", "hybrid"):
+        for profile in profiles if method != "keyword" else ["-"]:
+            recalls: list[float] = []
+            reciprocal_ranks: list[float] = []
+            latencies: list[float] = []
+            for (query, relevant), query_embedding in zip(sampled, embeddings):
+                ids, elapsed = await search(method, query, query_embedding, k, profile)
+                recalls.append(len(set(ids) & relevant) / max(1, min(k, len(relevant))))
+                first_hit = next((rank for rank, id in enumerate(ids, start=1) if id in relevant), None)
+                reciprocal_ranks.append(1 / first_hit if first_hit else 0.0)
+                latencies.append(elapsed * 1000)
+            print(f"{method:>8} {profile:>10} {statistics.mean(recalls):>10.3f} {statistics.mean(reciprocal_ranks):>8.3f} {statistics.median(latencies):>8.2f} {percentile(latencies, 0.95):>8.2f}")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", default=[config.vector_search_profile])
+    parser.add_argument("--kinds", nargs="+", choices=list(ioc_patterns), default=list(ioc_patterns))
+    args = parser.parse_args()
+    asyncio.run(run(args.queries, args.k, args.profiles, args.kinds))
+
+
+if __name__ == "__main__":
+    main()
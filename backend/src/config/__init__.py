@@ -28,6 +28,78 @@ class Config(BaseSettings):
 
     openai_api_key: str = ""
 
+    embedding_provider: Literal["openai", "local", "stub"] = "openai"
+    embedding_model: str = "" # empty means the provider's default model
+    embedding_dimensions: int = 1536 # must match the source_embeddings.embedding column
+    local_embedding_workers: int = 1
+
+    embedding_batch_max_inputs: int = 2048
+    embedding_batch_max_tokens: int = 250_000 # below the 300k tokens per request limit of the API
+    embedding_max_concurrency: int = 4
+    embedding_max_retries: int = 6
+
+    embedding_cache_size: int = 10_000 # in-process LRU entries, 0 disables it
+    enable_embedding_cache_database: bool = True
+    # Retention of the embedding_cache table, pruned daily by the enrichment server
+    embedding_cache_database_max_age: int = 180 # days, 0 keeps entries regardless of age
+    embedding_cache_database_max_rows: int = 1_000_000 # newest entries kept, 0 disables the cap
+
+    vector_search_profile: Literal["fast", "balanced", "accurate"] = "balanced"
+    # "halfvec" scans the half precision HNSW index and re-ranks vector_rerank_factor times more chunks exactly.
+    # It is the only embedding index of the schema, "vector" and "binary" are left for benchmarks and scan without one
+    vector_index: Literal["vector", "halfvec", "binary"] = "halfvec"
+    vector_rerank_factor: int = 4
+    # Reciprocal rank fusion constant of the hybrid search, higher values flatten the head of each ranking
+    hybrid_search_rrf_k: int = 60
+
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl: float = 3600 # seconds
+    search_result_cache_size: int = 256
+    search_result_cache_ttl: float = 0 # seconds, 0 disables the search result cache
+
+    source_export_batch_size: int = 1_000 # rows fetched per round trip of the export cursor
+
+    scraper_max_concurrency: int = 8
+    scraper_per_host_concurrency: int = 4
+    scraper_per_host_delay: float = 0.25
+    scraper_parse_executor: Literal["process", "thread"] = "process"
+    scraper_parse_workers: int = 0 # 0 means one worker per CPU
+    scraper_html_parser: str = "html.parser" # "lxml" if installed
+
+    # Shared HTTP client of the enrichment jobs
+    scraper_http2: bool = True # needs httpx[http2], falls back to HTTP/1.1 without it
+    scraper_user_agent: str = "Oracle enrichment"
+    scraper_http_max_connections: int = 32
+    scraper_http_max_keepalive_connections: int = 16
+    scraper_http_keepalive_expiry: float = 30 # seconds
+    scraper_http_timeout: float = 20 # seconds, read, write and pool
+    scraper_http_connect_timeout: float = 5 # seconds
+    scraper_http_retries: int = 3
+    scraper_http_backoff: float = 0.5 # seconds, doubled on every retry, with full jitter
+    scraper_http_backoff_max: float = 30 # seconds
+
+    # Bounded queues between the fetch -> parse -> chunk -> embed -> persist stages of a crawl
+    enrichment_pipeline_queue_size: int = 32
+    enrichment_pipeline_embed_batch: int = 16 # sources per embedding call
+    enrichment_pipeline_embed_workers: int = 2
+    enrichment_pipeline_persist_batch: int = 32 # sources per upsert
+    enrichment_pipeline_batch_timeout: float = 2 # seconds a partial batch waits for more sources
+
+    # Registered connectors scheduled by the enrichment server, empty schedules every one of them
+    enrichment_connectors: list[str] = []
+
+    # Crawls running at once across every connector and every enrichment server replica
+    enrichment_max_concurrent_crawls: int = 2
+    enrichment_lock_poll_interval: float = 5 # seconds between attempts to take a busy advisory lock
+    # Work items (crawls) of one job processed concurrently, still capped by enrichment_max_concurrent_crawls
+    enrichment_job_workers: int = 4
+    enrichment_work_item_lease: float = 600 # seconds, renewed while the item is processed
+    enrichment_work_item_max_attempts: int = 3
+
+    # Where the cron keeps the last run of each event, runs missed while it was down are caught up at startup
+    cron_state_store: Literal["database", "memory"] = "database"
+    cron_catch_up: bool = True
+
     environment: Literal["development", "testing", "staging", "production"] = "development"
 
     enable_database_telemetry: bool = False
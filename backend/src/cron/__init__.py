@@ -1,12 +1,13 @@
-"""Gevent based crontab implementation"""
+"""Asyncio based crontab implementation"""
 
 import asyncio
 from datetime import datetime, timedelta
 from typing import Any, Coroutine, Literal, Callable, Awaitable
-import gevent
 from typing import TypeVar
 import signal
 
+from .state import StateStore, MemoryStateStore, DatabaseStateStore
+
 class AllMatch(set):
     """Universal set - match everything"""
     def __contains__(self, item) -> Literal[True]:
@@ -23,10 +24,18 @@ def conv_to_set(obj: int | list[int] | tuple[int] | range | AllMatch) -> set:
         obj = set(obj)
     return obj
 
+def start_of_next_month(t: datetime) -> datetime:
+    if t.month == 12:
+        return t.replace(year=t.year + 1, month=1, day=1, hour=0, minute=0)
+    return t.replace(month=t.month + 1, day=1, hour=0, minute=0)
+
 
 T = TypeVar("T")
 Action = Callable[[T], Awaitable[None]] | Callable[[T], Any]
 
+# An event that never matches (e.g. day=31, month=2) gives up after this many years
+max_lookahead_years = 5
+
 class Event(object):
     """The Actual Event Class"""
 
@@ -38,7 +47,8 @@ class Event(object):
         month: AllMatch | int | set = allMatch,
         daysofweek: AllMatch | int | set = allMatch,
         args: T =(),
-        kwargs: T ={}
+        kwargs: T ={},
+        name: str | None = None,
     ) -> None:
         self.mins = conv_to_set(minute)
         self.hours = conv_to_set(hour)
@@ -48,6 +58,8 @@ class Event(object):
         self.action = action
         self.args = args
         self.kwargs = kwargs
+        # Key of the persisted last run, must be unique and stable across restarts
+        self.name = name or kwargs.get("name") or f"{action.__module__}.{action.__qualname__}"
 
         if callable(self.action) and isinstance(self.action, Coroutine):
             raise TypeError("Coroutine objects are not callable. Did you mean to pass a coroutine function?")
@@ -61,48 +73,146 @@ class Event(object):
                 (t1.month      in self.months) and
                 (t1.weekday()  in self.daysofweek))
 
-    def check(self, t: datetime) -> None:
-        """Check and run action if needed"""
-
-        if self.matchtime(t):
-            result = self.action(*self.args, **self.kwargs)
-            if self.async_event:
-                # If the action is a coroutine, run it in the event loop
-                asyncio.run(result)
+    def next_fire_time(self, after: datetime) -> datetime | None:
+        """
+        Return the first minute strictly after `after` at which this event triggers, None if there is none.
+        Non matching months, days and hours are skipped as a whole instead of minute by minute.
+        """
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * max_lookahead_years)
+        while t < limit:
+            if t.month not in self.months:
+                t = start_of_next_month(t)
+            elif t.day not in self.days or t.weekday() not in self.daysofweek:
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.mins:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        return None
+
+    async def run(self) -> None:
+        """Run the action, synchronous actions run in a worker thread to keep the event loop free"""
+        if self.async_event:
+            await self.action(*self.args, **self.kwargs)
+        else:
+            await asyncio.to_thread(self.action, *self.args, **self.kwargs)
 
 class CronTab(object):
     """The crontab implementation"""
 
     def __init__(self,
         *events: list[Event],
+        state_store: StateStore | None = None,
+        catch_up: bool = True,
+        on_startup: list[Callable[[], Awaitable[None]]] = [],
+        on_shutdown: list[Callable[[], Awaitable[None]]] = [],
     ) -> None:
         self.events: list[Event] = events
-
-    def _check(self) -> None:
-        """Check all events in separate greenlets"""
-
-        t1 = datetime(*datetime.now().timetuple()[:5])
+        names = [event.name for event in events]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Event names must be unique, found duplicates: {', '.join(sorted(duplicates))}")
+        self.state_store = state_store or MemoryStateStore()
+        self.catch_up = catch_up
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.tasks: set[asyncio.Task] = set()
+
+    async def _fire(self, event: Event, fire_time: datetime) -> None:
+        print(f"CronTab firing {event.name} ({fire_time:%Y-%m-%d %H:%M}).")
+        try:
+            await self.state_store.save(event.name, fire_time)
+        except Exception as e:
+            print(f"CronTab could not save the last run of {event.name}: {e}")
+        try:
+            await event.run()
+        except Exception as e:
+            print(f"CronTab event {event.name} failed: {e}")
+
+    def _spawn(self, event: Event, fire_time: datetime) -> None:
+        self._track(asyncio.create_task(self._fire(event, fire_time), name=event.name))
+
+    def _track(self, task: asyncio.Task) -> None:
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _startup(self, func: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await func()
+        except Exception as e:
+            print(f"CronTab startup task {func.__qualname__} failed: {e}")
+
+    async def _catch_up(self, now: datetime) -> None:
+        """Run once every event that missed at least one firing since its last recorded run"""
+        try:
+            last_runs = await self.state_store.load()
+        except Exception as e:
+            print(f"CronTab could not load the last runs, skipping catch up: {e}")
+            return
         for event in self.events:
-            gevent.spawn(event.check, t1)
-
-        t1 += timedelta(minutes=1)
-        s1 = (t1 - datetime.now()).seconds + 1
-        job = gevent.spawn_later(s1, self._check)
+            last_run = last_runs.get(event.name)
+            if last_run is None:
+                continue
+            missed = event.next_fire_time(last_run)
+            if missed is not None and missed < now:
+                print(f"CronTab catching up on {event.name}, missed its run at {missed:%Y-%m-%d %H:%M}.")
+                self._spawn(event, missed)
+
+    async def run_async(self, stop: asyncio.Event | None = None) -> None:
+        """Schedule the events until `stop` is set, then wait for the running events to finish"""
+        stop = stop or asyncio.Event()
+        for func in self.on_startup:
+            self._track(asyncio.create_task(self._startup(func), name=func.__qualname__))
+        now = datetime.now()
+        if self.catch_up:
+            await self._catch_up(now)
+
+        # Minute at which each event fires next, events compute it directly instead of polling every minute
+        next_fire = {event: event.next_fire_time(now) for event in self.events}
+        while not stop.is_set():
+            scheduled = [t for t in next_fire.values() if t is not None]
+            if not scheduled:
+                print("CronTab has no events left to schedule.")
+                break
+            delay = (min(scheduled) - datetime.now()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+
+            now = datetime.now()
+            for event, fire_time in next_fire.items():
+                if fire_time is not None and fire_time <= now:
+                    self._spawn(event, fire_time)
+                    next_fire[event] = event.next_fire_time(max(fire_time, now))
+
+        if self.tasks:
+            print(f"CronTab waiting for {len(self.tasks)} running event(s).")
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        for func in self.on_shutdown:
+            try:
+                await func()
+            except Exception as e:
+                print(f"CronTab shutdown task {func.__qualname__} failed: {e}")
 
     def run(self) -> None:
-        """Run the cron forever, exit gracefully on SIGTERM"""
-        stop = False
-        def handle_sigterm(signum, frame):
-            nonlocal stop
-            print("\nCronTab received SIGTERM. Exiting gracefully.")
-            stop = True
-        signal.signal(signal.SIGTERM, handle_sigterm)
+        """Run the cron forever on a single event loop, exit gracefully on SIGTERM"""
+        async def main() -> None:
+            stop = asyncio.Event()
+            def handle_sigterm() -> None:
+                print("\nCronTab received SIGTERM. Exiting gracefully.")
+                stop.set()
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, handle_sigterm)
+            await self.run_async(stop)
 
         print("CronTab started.")
-        self._check()
-        while not stop:
-            gevent.sleep(60)
-
+        asyncio.run(main())
         print("CronTab stopped.")
 
 default_crontab = CronTab()
@@ -112,4 +222,7 @@ __all__ = [
     "CronTab",
     "allMatch",
     "default_crontab",
+    "StateStore",
+    "MemoryStateStore",
+    "DatabaseStateStore",
 ]
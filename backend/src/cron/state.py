@@ -0,0 +1,65 @@
+"""Persistence of the last run of each cron event, used to catch up on runs missed while the cron was down"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+
+class StateStore(ABC):
+    """
+    Stores the last fire time of each event by event name. Fire times are naive local times,
+    like the times the events are matched against.
+    """
+
+    @abstractmethod
+    async def load(self) -> dict[str, datetime]:
+        ...
+
+    @abstractmethod
+    async def save(self, name: str, fired_at: datetime) -> None:
+        ...
+
+
+class MemoryStateStore(StateStore):
+    """Keeps the last runs in memory, nothing is caught up after a restart"""
+
+    def __init__(self) -> None:
+        self.last_runs: dict[str, datetime] = {}
+
+    async def load(self) -> dict[str, datetime]:
+        return dict(self.last_runs)
+
+    async def save(self, name: str, fired_at: datetime) -> None:
+        self.last_runs[name] = fired_at
+
+
+class DatabaseStateStore(StateStore):
+    """Keeps the last runs in the `cron_runs` table"""
+
+    async def load(self) -> dict[str, datetime]:
+        from src.db import crud
+        from src.db.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            last_runs = await crud.async_get_cron_runs(db)
+        finally:
+            await db.close()
+        # Stored timezone aware, the cron works in naive local time
+        return {name: fired_at.astimezone().replace(tzinfo=None) for name, fired_at in last_runs.items()}
+
+    async def save(self, name: str, fired_at: datetime) -> None:
+        from src.db import crud
+        from src.db.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            await crud.async_upsert_cron_run(db, name, fired_at.astimezone())
+        finally:
+            await db.close()
+
+
+__all__ = [
+    "StateStore",
+    "MemoryStateStore",
+    "DatabaseStateStore",
+]
@@ -1,11 +1,18 @@
+import asyncio
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select, func, asc, desc
-from pgvector.sqlalchemy import Vector
-from datetime import datetime
+from sqlalchemy.orm import selectinload, load_only
+from sqlalchemy import select, insert, update, delete, func, asc, desc, text, tuple_, and_, or_, cast, literal_column, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
+from datetime import datetime, timedelta
+from typing import AsyncIterator
 from opentelemetry import trace
 
+from src import utils
+from src.config import config
 from . import models, schemas
+from .pagination import InvalidCursorError, encode_cursor, decode_cursor, parse_cursor_value
 
 tracer = trace.get_tracer(__name__)
 
@@ -59,9 +66,145 @@ async def async_base_get_source(
     asc: bool = False,
     offset: int = 0,
     limit: int = -1,
+    cursor: str | None = None,
+    fields: list[str] | None = None,
 ) -> list[models.Source]:
+    """
+    List sources matching the filters. Pass the cursor of the previous page's last row
+    (`encode_source_cursor`) instead of an offset to page with keyset pagination.
+    `fields` loads only these columns (plus the id), the other attributes must not be accessed.
+    """
 
     stmt = select(models.Source)
+    if fields:
+        stmt = stmt.options(load_only(*[_source_column(field) for field in fields], raiseload=True))
+    stmt = _filter_sources(
+        stmt,
+        id=id,
+        enrichment_job_id=enrichment_job_id,
+        title=title,
+        title_like=title_like,
+        url=url,
+        content_like=content_like,
+        urls=urls,
+        published_after=published_after,
+        published_before=published_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
+    )
+
+    if cursor:
+        return await _async_get_source_page_after(db, stmt, cursor, order_by or "id", asc, limit)
+
+    if order_by:
+        stmt = stmt.order_by(*_source_ordering(order_by, asc))
+
+    if limit > 0:
+        stmt = stmt.limit(limit)
+
+    stmt = stmt.offset(offset)
+
+    res = await db.execute(stmt)
+    return res.scalars().all()
+
+async def async_get_sources_with_total(
+    db: AsyncSession,
+    total: str = "exact",
+    order_by: str | None = None,
+    asc: bool = False,
+    offset: int = 0,
+    limit: int = -1,
+    cursor: str | None = None,
+    fields: list[str] | None = None,
+    **filters,
+) -> tuple[list[models.Source], int]:
+    """
+    A page of `async_base_get_source` together with the number of sources matching the filters.
+
+    With `total="exact"` and offset pagination the total is a `count(*) OVER ()` window over the same
+    query, so page and total come back in one round trip. Keyset pages (`cursor`) and pages past the end
+    fall back to `async_count_sources`. With `total="estimated"` the total comes from the planner
+    statistics, see `async_estimate_count_sources`.
+    """
+    page_args = dict(order_by=order_by, asc=asc, offset=offset, limit=limit, cursor=cursor, fields=fields)
+    if total == "estimated":
+        sources = await async_base_get_source(db, **page_args, **filters)
+        return sources, await async_estimate_count_sources(db, **filters)
+    if cursor:
+        sources = await async_base_get_source(db, **page_args, **filters)
+        return sources, await async_count_sources(db, **filters)
+
+    stmt = select(models.Source, func.count().over().label("total"))
+    if fields:
+        stmt = stmt.options(load_only(*[_source_column(field) for field in fields], raiseload=True))
+    stmt = _filter_sources(stmt, **filters)
+    if order_by:
+        stmt = stmt.order_by(*_source_ordering(order_by, asc))
+    if limit > 0:
+        stmt = stmt.limit(limit)
+    stmt = stmt.offset(offset)
+
+    res = await db.execute(stmt)
+    rows = res.all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total
+    if offset > 0:
+        return [], await async_count_sources(db, **filters)
+    return [], 0
+
+@tracer.start_as_current_span("async_estimate_count_sources")
+def _explain_statement(stmt, dialect) -> tuple[str, dict]:
+    """
+    Driver level `EXPLAIN (FORMAT JSON)` of `stmt` and its parameters. Expanding IN parameters (the `urls`
+    filter) are rendered as one bound parameter per value, the driver does not know the POSTCOMPILE placeholders.
+    """
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+
+async def async_estimate_count_sources(
+    db: AsyncSession,
+    **filters,
+) -> int:
+    """
+    Planner estimate of the number of sources matching the filters of `async_base_get_source`.
+
+    Without filters this is `pg_class.reltuples` of the table, kept up to date by (auto)vacuum and analyze,
+    with filters it is the row estimate of the query plan. Both are free compared to a `count(*)` but can be
+    off, especially for substring filters. Falls back to the exact count while the table was never analyzed.
+    """
+    stmt = _filter_sources(select(models.Source.id), **filters)
+    if stmt.whereclause is None:
+        res = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": models.Source.__tablename__},
+        )
+        estimate = res.scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+        return await async_count_sources(db, **filters)
+
+    conn = await db.connection()
+    sql, params = _explain_statement(stmt, conn.dialect)
+    res = await conn.exec_driver_sql(sql, params)
+    plan = res.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def _filter_sources(
+    stmt,
+    id: int | None = None,
+    enrichment_job_id: int | None = None,
+    title: str | None = None,
+    title_like: str | None = None,
+    url: str | None = None,
+    content_like: str | None = None,
+    urls: list[str] | None = None,
+    published_after: datetime | None = None,
+    published_before: datetime | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
+):
     if id:
         stmt = stmt.filter(models.Source.id == id)
     if enrichment_job_id:
@@ -85,36 +228,242 @@ async def async_base_get_source(
         stmt = stmt.filter(models.Source.updated_on > updated_after)
     if updated_before:
         stmt = stmt.filter(models.Source.updated_on < updated_before)
+    return stmt
 
-    if order_by:
-        if asc:
-            stmt = stmt.order_by(getattr(models.Source, order_by, "id").asc())
-        else:
-            stmt = stmt.order_by(getattr(models.Source, order_by, "id").desc())
+async def async_stream_sources(
+    db: AsyncSession,
+    fields: list[str] | tuple[str, ...] | None = None,
+    order_by: str = "id",
+    asc: bool = True,
+    batch_size: int = 1_000,
+    **filters,
+) -> AsyncIterator[list[dict]]:
+    """
+    Stream the sources matching the filters of `async_base_get_source` in batches of `batch_size` rows,
+    through a server-side cursor, so only one batch is held in memory at a time.
+    Rows are dicts of `fields` (default every column of `source_columns`).
+    """
+    columns = [_source_column(field) for field in fields or source_columns]
+    stmt = _filter_sources(select(*columns), **filters)
+    stmt = stmt.order_by(*_source_ordering(order_by, asc)).execution_options(yield_per=batch_size)
+
+    with tracer.start_as_current_span("async_stream_sources") as span:
+        rows = 0
+        result = await db.stream(stmt)
+        try:
+            async for partition in result.mappings().partitions():
+                rows += len(partition)
+                yield [dict(row) for row in partition]
+        finally:
+            await result.close()
+            span.set_attribute("rows", rows)
+
+@tracer.start_as_current_span("async_get_sources_published_or_updated")
+async def async_get_sources_published_or_updated(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime,
+    limit: int = -1,
+    fields: list[str] | None = None,
+) -> list[models.Source]:
+    """
+    Sources published or updated between `since` and `until` (both inclusive), most recent activity first.
 
+    One query: the two range predicates are OR-ed so Postgres combines the `published_on` and `updated_on`
+    indexes in a bitmap scan, and its cost follows the size of the window rather than the table.
+    `fields` loads only these columns (plus the id), the other attributes must not be accessed.
+    """
+    last_activity = func.greatest(
+        models.Source.updated_on,
+        cast(models.Source.published_on, DateTime(timezone=True)),
+    )
+    stmt = select(models.Source).filter(
+        or_(
+            models.Source.published_on.between(since.date(), until.date()),
+            models.Source.updated_on.between(since, until),
+        )
+    )
+    if fields:
+        stmt = stmt.options(load_only(*[_source_column(field) for field in fields], raiseload=True))
+    stmt = stmt.order_by(last_activity.desc(), models.Source.id.desc())
     if limit > 0:
         stmt = stmt.limit(limit)
 
-    stmt = stmt.offset(offset)
-
     res = await db.execute(stmt)
     return res.scalars().all()
 
+def _source_column(name: str):
+    if name not in source_columns:
+        raise ValueError(f"Unknown source column {name}")
+    return getattr(models.Source, name)
+
+def _source_order_column(order_by: str):
+    return _source_column(order_by)
+
+def _source_ordering(order_by: str, asc: bool) -> list:
+    """
+    ORDER BY clauses for `order_by`, with the id as tie breaker so that the order is stable.
+    NULLs sort as the largest values (Postgres' default), matching a plain btree index on (column, id).
+    """
+    column = _source_order_column(order_by)
+    if column is models.Source.id:
+        return [column.asc() if asc else column.desc()]
+    if asc:
+        return [column.asc(), models.Source.id.asc()]
+    return [column.desc(), models.Source.id.desc()]
+
+# Orderings with a (column, id) index, the only ones that page with cursors. Other columns would make
+# slow cursors and, for content, cursors holding a whole diary
+source_cursor_columns = ("id", "title", "published_on", "updated_on", "fetched_on")
+
+def encode_source_cursor(source: models.Source, order_by: str | None = None, asc: bool = False) -> str:
+    """
+    Opaque cursor pointing right after `source` in a listing ordered by (`order_by`, id).
+    `order_by` must be one of `source_cursor_columns`.
+    """
+    order_by = order_by or "id"
+    if order_by not in source_cursor_columns:
+        raise ValueError(f"Cursor pagination is not supported when ordering by {order_by}")
+    return encode_cursor({
+        "o": order_by,
+        "a": asc,
+        "v": getattr(source, order_by),
+        "i": source.id,
+    })
+
+async def _async_get_source_page_after(
+    db: AsyncSession,
+    stmt,
+    cursor: str,
+    order_by: str,
+    asc: bool,
+    limit: int,
+) -> list[models.Source]:
+    """
+    Keyset pagination: the rows of `stmt` that come after `cursor` in (`order_by`, id) order.
+
+    Each predicate is a row comparison on (column, id), so every page is an index range scan no matter
+    how deep it is. NULLs of nullable columns form their own segment, after the values when ascending
+    and before them when descending, the segment that follows is only read when the current one runs out.
+    """
+    if order_by not in source_cursor_columns:
+        raise InvalidCursorError(
+            f"Cursor pagination is only supported when ordering by {', '.join(source_cursor_columns)}"
+        )
+    payload = decode_cursor(cursor)
+    if payload.get("o") != order_by or payload.get("a") != asc or "i" not in payload:
+        raise InvalidCursorError("Cursor does not match the requested ordering")
+    column = _source_order_column(order_by)
+    cursor_id = parse_cursor_value(models.Source.id, payload["i"])
+    cursor_value = parse_cursor_value(column, payload.get("v"))
+
+    if column is models.Source.id:
+        segments = [models.Source.id > cursor_id if asc else models.Source.id < cursor_id]
+    elif cursor_value is None:
+        # Inside the NULL segment
+        segments = [and_(column.is_(None), models.Source.id > cursor_id if asc else models.Source.id < cursor_id)]
+        if not asc:
+            segments.append(column.is_not(None))
+    else:
+        position = tuple_(column, models.Source.id)
+        segments = [position > tuple_(cursor_value, cursor_id) if asc else position < tuple_(cursor_value, cursor_id)]
+        if asc and column.nullable:
+            segments.append(column.is_(None))
+
+    sources: list[models.Source] = []
+    for segment in segments:
+        page = stmt.filter(segment).order_by(*_source_ordering(order_by, asc))
+        if limit > 0:
+            page = page.limit(limit - len(sources))
+        res = await db.execute(page)
+        sources.extend(res.scalars().all())
+        if limit > 0 and len(sources) >= limit:
+            break
+    return sources
+
+async def async_get_source_content_hashes(
+    db: AsyncSession,
+    urls: list[str],
+) -> dict[str, str | None]:
+    """
+    Map each url of `urls` that is already stored to the content hash of its source.
+    """
+    if not urls:
+        return {}
+    stmt = select(models.Source.url, models.Source.content_hash).filter(models.Source.url.in_(urls))
+    res = await db.execute(stmt)
+    return {url: content_hash for url, content_hash in res.all()}
+
+async def async_get_sources_version(
+    db: AsyncSession,
+) -> tuple[int | None, datetime | None]:
+    """
+    Cheap marker that changes whenever a source is inserted or re-fetched, used to invalidate search caches.
+    """
+    stmt = select(func.max(models.Source.id), func.max(models.Source.fetched_on))
+    res = await db.execute(stmt)
+    return tuple(res.one())
+
 ### Source Embedding ###
+# Recall/latency trade-offs of the HNSW index. iterative_scan needs pgvector >= 0.8.0
+vector_search_profiles: dict[str, dict[str, str]] = {
+    "fast": {
+        "hnsw.ef_search": "40",
+    },
+    "balanced": {
+        "hnsw.ef_search": "100",
+        "hnsw.iterative_scan": "relaxed_order",
+    },
+    "accurate": {
+        "hnsw.ef_search": "400",
+        "hnsw.iterative_scan": "strict_order",
+    },
+}
+# Highest hnsw.ef_search pgvector accepts
+max_ef_search = 1000
+
+async def async_apply_vector_search_profile(
+    db: AsyncSession,
+    profile: str | None = None,
+    min_ef_search: int = 0,
+) -> None:
+    """
+    Apply a vector search profile (`vector_search_profiles`) to the current transaction, like `SET LOCAL`.
+    Defaults to the `vector_search_profile` setting. Without iterative scans an HNSW scan returns at most
+    ef_search rows, `min_ef_search` raises it (up to pgvector's maximum of 1000) for larger LIMITs.
+    Past that maximum a profile without iterative scans gets relaxed order iterative scans, so the scan
+    still returns `min_ef_search` rows instead of silently stopping at 1000.
+    """
+    settings = dict(vector_search_profiles[profile or config.vector_search_profile])
+    settings["hnsw.ef_search"] = str(min(max_ef_search, max(int(settings["hnsw.ef_search"]), min_ef_search)))
+    if min_ef_search > max_ef_search:
+        settings.setdefault("hnsw.iterative_scan", "relaxed_order")
+    for name, value in settings.items():
+        await db.execute(
+            text("SELECT set_config(:name, :value, true)"),
+            {"name": name, "value": value},
+        )
+
 @tracer.start_as_current_span("async_similarity_search_source_embedding")
 async def async_similarity_search_source_embedding(
     db: AsyncSession,
     query_embedding: list[float],
     limit: int = 10,
+    profile: str | None = None,
 ) -> list[tuple[models.SourceEmbedding, float]]:
     """
     Perform a vector search on the source embeddings using cosine similarity.
+    `profile` selects the recall/latency trade-off, see `vector_search_profiles`.
+    The chunks are ordered through the half precision index, `distance` is the exact cosine distance.
     """
+    await async_apply_vector_search_profile(db, profile, min_ef_search=limit)
+    dimensions = models.SourceEmbedding.embedding.type.dim
     stmt = select(
         models.SourceEmbedding,
         models.SourceEmbedding.embedding.cosine_distance(query_embedding).label("distance")
     )
-    stmt = stmt.order_by(asc("distance"))
+    # Must match the expression of sources_embedding_halfvec_idx
+    stmt = stmt.order_by(func.cast(models.SourceEmbedding.embedding, HALFVEC(dimensions)).cosine_distance(query_embedding))
     if limit > 0:
         stmt = stmt.limit(limit)
 
@@ -123,6 +472,317 @@ async def async_similarity_search_source_embedding(
     res = await db.execute(stmt)
     return res.all()
 
+def _chunk_hits(
+    query_embedding: list[float],
+    candidates: int,
+    index: str,
+    rerank_factor: int,
+):
+    """
+    CTE of the `candidates` chunks closest to the query embedding as (source_id, distance), distance being
+    the exact cosine distance. With a compact `index` ("halfvec" or "binary") `candidates * rerank_factor`
+    chunks are read from the compact index and re-scored against the full precision embeddings.
+    """
+    if index == "vector":
+        exact_distance = models.SourceEmbedding.embedding.cosine_distance(query_embedding)
+        return (
+            select(models.SourceEmbedding.source_id, exact_distance.label("distance"))
+            .order_by(exact_distance)
+            .limit(candidates)
+            .cte("hits")
+        )
+
+    dimensions = models.SourceEmbedding.embedding.type.dim
+    if index == "halfvec":
+        # Must match the expression of sources_embedding_halfvec_idx
+        approx_distance = func.cast(models.SourceEmbedding.embedding, HALFVEC(dimensions)).cosine_distance(query_embedding)
+    elif index == "binary":
+        # Same expression as the binary index of src.benchmarks.hnsw_recall, the schema does not build it
+        approx_distance = func.cast(func.binary_quantize(models.SourceEmbedding.embedding), BIT(dimensions)).hamming_distance(
+            func.binary_quantize(func.cast(query_embedding, Vector(dimensions)))
+        )
+    else:
+        raise ValueError(f"Unknown vector index: {index}")
+
+    approx_hits = (
+        select(models.SourceEmbedding.source_id, models.SourceEmbedding.embedding)
+        .order_by(approx_distance)
+        .limit(candidates * max(1, rerank_factor))
+        .cte("approx_hits")
+    )
+    # Re-score from the CTE's own rows, so the planner can not fall back to the full precision index
+    rescored_distance = approx_hits.c.embedding.cosine_distance(query_embedding)
+    return (
+        select(approx_hits.c.source_id, rescored_distance.label("distance"))
+        .order_by(rescored_distance)
+        .limit(candidates)
+        .cte("hits")
+    )
+
+source_columns = (
+    "id",
+    "enrichment_job_id",
+    "type",
+    "title",
+    "url",
+    "content",
+    "fetched_on",
+    "published_on",
+    "updated_on",
+)
+
+source_summary_columns = tuple(column for column in source_columns if column != "content")
+
+fulltext_config = literal_column("'simple'::regconfig")
+
+@tracer.start_as_current_span("async_fulltext_search_sources")
+async def async_fulltext_search_sources(
+    db: AsyncSession,
+    query: str,
+    limit: int = 10,
+    offset: int = 0,
+    columns: list[str] | tuple[str, ...] = source_summary_columns,
+    snippets: bool = True,
+) -> list[dict]:
+    """
+    Keyword search over the title and content of the sources, best match first.
+
+    `query` uses web search syntax ("quoted phrases", OR, -excluded) and is matched against the
+    `search_vector` GIN index, matches in the title weigh more than matches in the content.
+    Each row holds the requested `columns`, its `rank` and, with `snippets`, a highlighted `snippet`
+    of the content. Snippets are only computed for the returned page.
+    """
+    tsquery = func.websearch_to_tsquery(fulltext_config, query)
+    rank = func.ts_rank_cd(models.Source.search_vector, tsquery)
+    top = (
+        select(models.Source.id, rank.label("rank"))
+        .filter(models.Source.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), models.Source.id.asc())
+        .offset(offset)
+    )
+    if limit > 0:
+        top = top.limit(limit)
+    top = top.subquery("top")
+
+    selected = [*[_source_column(column) for column in columns], top.c.rank]
+    if snippets:
+        selected.append(
+            func.ts_headline(
+                fulltext_config,
+                models.Source.content,
+                tsquery,
+                "StartSel=<mark>, StopSel=</mark>, MaxFragments=3, MaxWords=25, MinWords=8",
+            ).label("snippet")
+        )
+    stmt = (
+        select(*selected)
+        .join(top, top.c.id == models.Source.id)
+        .order_by(top.c.rank.desc(), models.Source.id.asc())
+    )
+    res = await db.execute(stmt)
+    return [dict(row) for row in res.mappings().all()]
+
+@tracer.start_as_current_span("async_similarity_search_sources")
+async def async_similarity_search_sources(
+    db: AsyncSession,
+    query_embedding: list[float],
+    limit: int = 10,
+    columns: list[str] | tuple[str, ...] = source_columns,
+    candidates: int | None = None,
+    max_candidates: int = 2_000,
+    profile: str | None = None,
+    index: str | None = None,
+) -> list[dict]:
+    """
+    Return the top `limit` sources for a query embedding, closest first.
+
+    The closest chunks are taken from the HNSW index, grouped per source and ranked by their average
+    cosine distance inside Postgres, so only one row per source with the requested `columns` (plus
+    `distance`) comes back. The candidate window starts at `candidates` chunks (default `limit * 4`) and
+    is doubled until `limit` distinct sources are found, the table runs out of chunks or `max_candidates` is reached.
+    `profile` selects the recall/latency trade-off of the index scan, see `vector_search_profiles`.
+    `index` selects the index to scan (default `vector_index`), compact indexes are re-ranked exactly.
+    """
+    if limit <= 0:
+        return []
+    candidates = max(limit, candidates or limit * 4)
+    selected_columns = [getattr(models.Source, column) for column in columns]
+    index = index or config.vector_index
+    rerank_factor = config.vector_rerank_factor if index != "vector" else 1
+
+    while True:
+        await async_apply_vector_search_profile(db, profile, min_ef_search=candidates * rerank_factor)
+        hits = _chunk_hits(query_embedding, candidates, index, rerank_factor)
+        ranked = (
+            select(
+                hits.c.source_id,
+                func.avg(hits.c.distance).label("distance"),
+                func.count().label("hit_count"),
+            )
+            .group_by(hits.c.source_id)
+            .subquery("ranked")
+        )
+        stmt = (
+            select(
+                *selected_columns,
+                ranked.c.distance,
+                # Window functions run before LIMIT, this is the number of chunks the index returned
+                func.sum(ranked.c.hit_count).over().label("candidate_hits"),
+            )
+            .join(ranked, ranked.c.source_id == models.Source.id)
+            .order_by(ranked.c.distance.asc(), models.Source.id.asc())
+            .limit(limit)
+        )
+        res = await db.execute(stmt)
+        rows = [dict(row) for row in res.mappings().all()]
+
+        candidate_hits = rows[0]["candidate_hits"] if rows else 0
+        if len(rows) >= limit or candidate_hits < candidates or candidates >= max_candidates:
+            break
+        candidates = min(candidates * 2, max_candidates)
+
+    for row in rows:
+        row.pop("candidate_hits", None)
+    return rows
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int = 60) -> list[tuple[float, list[int | None], dict]]:
+    """
+    Fuse several rankings of rows keyed on "id" with reciprocal rank fusion, sum(1 / (k + rank)).
+    Returns (score, 1-based rank in each ranking or None, merged row) tuples, best first.
+    """
+    fused: dict[int, tuple[float, list[int | None], dict]] = {}
+    for position, ranking in enumerate(rankings):
+        for rank, row in enumerate(ranking, start=1):
+            score, ranks, merged = fused.get(row["id"], (0.0, [None] * len(rankings), {}))
+            ranks[position] = rank
+            merged.update(row)
+            fused[row["id"]] = (score + 1 / (k + rank), ranks, merged)
+    return sorted(fused.values(), key=lambda item: (-item[0], item[2]["id"]))
+
+@tracer.start_as_current_span("async_hybrid_search_sources")
+async def async_hybrid_search_sources(
+    keyword_db: AsyncSession,
+    vector_db: AsyncSession,
+    query: str,
+    query_embedding: list[float],
+    limit: int = 10,
+    columns: list[str] | tuple[str, ...] = source_summary_columns,
+    candidates: int | None = None,
+    k: int | None = None,
+    profile: str | None = None,
+    index: str | None = None,
+) -> list[dict]:
+    """
+    Return the top `limit` sources for a query, combining keyword and vector search.
+
+    The full-text and the HNSW candidate queries run concurrently, each on its own session since a
+    session runs one query at a time, and their top `candidates` sources (default `limit * 4`) are fused
+    with reciprocal rank fusion. Each row holds the requested `columns`, its fused `score`, its
+    `keyword_rank` and `vector_rank` (None when the source is missing from that ranking) and, when
+    available, the vector `distance` and the keyword `snippet`.
+    """
+    if limit <= 0:
+        return []
+    candidates = max(limit, candidates or limit * 4)
+    k = k or config.hybrid_search_rrf_k
+    columns = tuple(dict.fromkeys(("id", *columns)))
+
+    keyword_rows, vector_rows = await asyncio.gather(
+        async_fulltext_search_sources(keyword_db, query, limit=candidates, columns=columns),
+        async_similarity_search_sources(
+            vector_db,
+            query_embedding,
+            limit=candidates,
+            columns=columns,
+            profile=profile,
+            index=index,
+        ),
+    )
+
+    rows = []
+    for score, (keyword_rank, vector_rank), row in reciprocal_rank_fusion([keyword_rows, vector_rows], k)[:limit]:
+        row.pop("rank", None)
+        row.update(score=score, keyword_rank=keyword_rank, vector_rank=vector_rank)
+        rows.append(row)
+    return rows
+
+
+#### EmbeddingCache ####
+async def async_get_cached_embeddings(
+    db: AsyncSession,
+    model: str,
+    content_hashes: list[str],
+) -> dict[str, list[float]]:
+    """
+    Map each of `content_hashes` that is cached for `model` to its embedding.
+    """
+    if not content_hashes:
+        return {}
+    stmt = select(models.EmbeddingCache.content_hash, models.EmbeddingCache.embedding).filter(
+        models.EmbeddingCache.model == model,
+        models.EmbeddingCache.content_hash.in_(content_hashes),
+    )
+    res = await db.execute(stmt)
+    return {
+        content_hash: embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+        for content_hash, embedding in res.all()
+    }
+
+
+#### ArchivePage ####
+async def async_get_archive_page(db: AsyncSession, url: str) -> models.ArchivePage | None:
+    return await db.get(models.ArchivePage, url)
+
+#### CronRun ####
+async def async_get_cron_runs(db: AsyncSession) -> dict[str, datetime]:
+    """
+    Map each cron event name to the time it last fired.
+    """
+    res = await db.execute(select(models.CronRun.name, models.CronRun.last_fired_at))
+    return dict(res.all())
+
+
+#### EnrichmentWorkItem ####
+def _claimable_work_items(max_attempts: int):
+    return or_(
+        models.EnrichmentWorkItem.status == models.JobStatus.PENDING,
+        and_(
+            models.EnrichmentWorkItem.status == models.JobStatus.RUNNING,
+            models.EnrichmentWorkItem.lease_expires_at < func.now(),
+            models.EnrichmentWorkItem.attempts < max_attempts,
+        ),
+    )
+
+async def async_get_resumable_enrichment_jobs(db: AsyncSession, name: str | None = None) -> list[models.EnrichmentJob]:
+    """
+    Running jobs (named `name` when given) that still have pending or running work items.
+    """
+    stmt = select(models.EnrichmentJob).filter(
+        models.EnrichmentJob.status == models.JobStatus.RUNNING,
+        select(models.EnrichmentWorkItem.id)
+        .filter(
+            models.EnrichmentWorkItem.enrichment_job_id == models.EnrichmentJob.id,
+            models.EnrichmentWorkItem.status.in_([models.JobStatus.PENDING, models.JobStatus.RUNNING]),
+        )
+        .exists(),
+    ).order_by(models.EnrichmentJob.id)
+    if name is not None:
+        stmt = stmt.filter(models.EnrichmentJob.name == name)
+    res = await db.execute(stmt)
+    return res.scalars().all()
+
+async def async_count_enrichment_work_items(db: AsyncSession, enrichment_job_id: int) -> dict[models.JobStatus, int]:
+    """
+    Number of work items of a job per status.
+    """
+    stmt = (
+        select(models.EnrichmentWorkItem.status, func.count())
+        .filter(models.EnrichmentWorkItem.enrichment_job_id == enrichment_job_id)
+        .group_by(models.EnrichmentWorkItem.status)
+    )
+    res = await db.execute(stmt)
+    return dict(res.all())
 
 ### Update operations ###
 
@@ -139,6 +799,138 @@ async def async_base_update_enrichment_job(db: AsyncSession, enrichment_job: mod
     await db.commit()
     return enrichment_job
 
+#### EnrichmentWorkItem ####
+async def async_claim_enrichment_work_item(
+    db: AsyncSession,
+    enrichment_job_id: int,
+    lease_seconds: float,
+    max_attempts: int,
+) -> models.EnrichmentWorkItem | None:
+    """
+    Claim the next work item of a job, None when there is nothing left to claim.
+
+    The candidate row is locked with FOR UPDATE SKIP LOCKED, so concurrent workers never claim the same
+    item. The claimed item is RUNNING until its lease expires, see `async_renew_enrichment_work_item_lease`.
+    """
+    candidate = (
+        select(models.EnrichmentWorkItem.id)
+        .filter(
+            models.EnrichmentWorkItem.enrichment_job_id == enrichment_job_id,
+            _claimable_work_items(max_attempts),
+        )
+        .order_by(models.EnrichmentWorkItem.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(models.EnrichmentWorkItem)
+        .where(models.EnrichmentWorkItem.id == candidate)
+        .values(
+            status=models.JobStatus.RUNNING,
+            attempts=models.EnrichmentWorkItem.attempts + 1,
+            lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+            started_at=func.now(),
+            finished_at=None,
+        )
+        .returning(models.EnrichmentWorkItem)
+    )
+    try:
+        res = await db.execute(stmt)
+        work_item = res.scalars().first()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return work_item
+
+async def async_renew_enrichment_work_item_lease(db: AsyncSession, work_item_id: int, lease_seconds: float) -> None:
+    stmt = (
+        update(models.EnrichmentWorkItem)
+        .where(
+            models.EnrichmentWorkItem.id == work_item_id,
+            models.EnrichmentWorkItem.status == models.JobStatus.RUNNING,
+        )
+        .values(lease_expires_at=func.now() + timedelta(seconds=lease_seconds))
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def async_finish_enrichment_work_item(
+    db: AsyncSession,
+    work_item_id: int,
+    status: models.JobStatus,
+    error: str | None = None,
+) -> None:
+    """
+    Checkpoint a claimed work item: COMPLETED, FAILED, or back to PENDING to be retried.
+    """
+    stmt = (
+        update(models.EnrichmentWorkItem)
+        .where(models.EnrichmentWorkItem.id == work_item_id)
+        .values(
+            status=status,
+            error=error,
+            lease_expires_at=None,
+            finished_at=func.now(),
+        )
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def async_requeue_enrichment_work_items(db: AsyncSession, enrichment_job_id: int, max_attempts: int) -> int:
+    """
+    Put the running work items of a job that have attempts left back to PENDING, their workers are gone.
+    Only call it while holding the job's lock. Returns the number of requeued items.
+    """
+    stmt = (
+        update(models.EnrichmentWorkItem)
+        .where(
+            models.EnrichmentWorkItem.enrichment_job_id == enrichment_job_id,
+            models.EnrichmentWorkItem.status == models.JobStatus.RUNNING,
+            models.EnrichmentWorkItem.attempts < max_attempts,
+        )
+        .values(status=models.JobStatus.PENDING, lease_expires_at=None)
+    )
+    try:
+        res = await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return res.rowcount
+
+async def async_fail_unfinished_enrichment_work_items(db: AsyncSession, enrichment_job_id: int) -> None:
+    """
+    Mark the work items of a job that will not be claimed again as FAILED.
+    """
+    stmt = (
+        update(models.EnrichmentWorkItem)
+        .where(
+            models.EnrichmentWorkItem.enrichment_job_id == enrichment_job_id,
+            models.EnrichmentWorkItem.status.in_([models.JobStatus.PENDING, models.JobStatus.RUNNING]),
+        )
+        .values(
+            status=models.JobStatus.FAILED,
+            error=func.coalesce(models.EnrichmentWorkItem.error, "Abandoned"),
+            lease_expires_at=None,
+        )
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
 ### Write operations ###
 
 #### EnrichmentJob ####
@@ -148,6 +940,16 @@ async def async_base_create_enrichment_job(db: AsyncSession, enrichment_job: sch
     await db.commit()
     return db_enrichment_job
 
+#### EnrichmentWorkItem ####
+async def async_bulk_create_enrichment_work_items(
+    db: AsyncSession,
+    work_items: list[schemas.EnrichmentWorkItemCreate],
+) -> list[models.EnrichmentWorkItem]:
+    db_work_items = [models.EnrichmentWorkItem(**work_item.model_dump()) for work_item in work_items]
+    db.add_all(db_work_items)
+    await db.commit()
+    return db_work_items
+
 #### Source ####
 async def async_base_create_source(db: AsyncSession, source: schemas.SourceCreate) -> models.Source:
     db_source = models.Source(**source.model_dump())
@@ -164,40 +966,192 @@ async def async_base_create_source_embedding(
     await db.commit()
     return db_source_embedding
 
+#### EmbeddingCache ####
+async def async_bulk_create_cached_embeddings(
+    db: AsyncSession,
+    model: str,
+    embeddings: dict[str, list[float]],
+) -> None:
+    """
+    Store content hash -> embedding pairs for `model`, entries that are already cached are left as they are.
+    """
+    if not embeddings:
+        return
+    stmt = pg_insert(models.EmbeddingCache).values([
+        {
+            "content_hash": content_hash,
+            "model": model,
+            "embedding": embedding,
+        }
+        for content_hash, embedding in embeddings.items()
+    ])
+    stmt = stmt.on_conflict_do_nothing(index_elements=[models.EmbeddingCache.content_hash, models.EmbeddingCache.model])
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+#### ArchivePage ####
+async def async_upsert_archive_page(db: AsyncSession, archive_page: schemas.ArchivePage) -> None:
+    """
+    Store the validators and diary urls of an archive page, replacing the previous ones.
+    """
+    values = archive_page.model_dump()
+    stmt = pg_insert(models.ArchivePage).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.ArchivePage.url],
+        set_={key: stmt.excluded[key] for key in values if key != "url"},
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+#### CronRun ####
+async def async_upsert_cron_run(db: AsyncSession, name: str, fired_at: datetime) -> None:
+    """
+    Record that the cron event `name` fired at `fired_at`.
+    """
+    stmt = pg_insert(models.CronRun).values(name=name, last_fired_at=fired_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.CronRun.name],
+        set_={"last_fired_at": stmt.excluded.last_fired_at},
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
 ### Read/Write operations ###
 
+#### Source ####
+def _source_row(source: schemas.SourceCreate) -> dict:
+    row = source.model_dump()
+    if row.get("content_hash") is None and row.get("content") is not None:
+        row["content_hash"] = utils.content_hash(row["content"])
+    return row
+
+@tracer.start_as_current_span("async_bulk_upsert_sources_with_embeddings")
+async def async_bulk_upsert_sources_with_embeddings(
+    db: AsyncSession,
+    sources: list[schemas.SourceCreate],
+    embeddings: list[list[schemas.SourceEmbeddingChunk]],
+) -> dict[str, int]:
+    """
+    Insert or update a batch of sources keyed on url, in a single transaction.
+
+    New urls are inserted. Existing urls are only updated when their content hash changed, in which case
+    their embedding chunks are replaced. Unchanged sources are left untouched, including their chunks.
+    `embeddings[i]` holds the chunks of `sources[i]`. Returns the url -> id map of the sources written.
+    """
+    if len(sources) != len(embeddings):
+        raise ValueError("sources and embeddings must have the same length")
+
+    # ON CONFLICT can not touch the same row twice in one statement, the last occurrence of a url wins
+    rows_by_url: dict[str, tuple[dict, list[schemas.SourceEmbeddingChunk]]] = {}
+    for source, chunks in zip(sources, embeddings):
+        rows_by_url[source.url] = (_source_row(source), chunks)
+    if not rows_by_url:
+        return {}
+
+    stmt = pg_insert(models.Source).values([row for row, _ in rows_by_url.values()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Source.url],
+        set_={
+            column: stmt.excluded[column]
+            for column in (
+                "enrichment_job_id",
+                "type",
+                "title",
+                "content",
+                "content_hash",
+                "fetched_on",
+                "published_on",
+                "updated_on",
+            )
+        },
+        where=models.Source.content_hash.is_distinct_from(stmt.excluded.content_hash),
+    )
+    stmt = stmt.returning(models.Source.id, models.Source.url)
+
+    try:
+        res = await db.execute(stmt)
+        written: dict[str, int] = {url: source_id for source_id, url in res.all()}
+
+        if written:
+            # Drop the chunks of updated sources, this is a no-op for the inserted ones
+            await db.execute(
+                delete(models.SourceEmbedding).filter(
+                    models.SourceEmbedding.source_id.in_(list(written.values()))
+                )
+            )
+            embedding_rows = [
+                {
+                    "source_id": source_id,
+                    "chunk": chunk.chunk,
+                    "embedding": chunk.embedding,
+                }
+                for url, source_id in written.items()
+                for chunk in rows_by_url[url][1]
+            ]
+            if embedding_rows:
+                await db.execute(insert(models.SourceEmbedding), embedding_rows)
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return written
+
 ### Delete operations ###
 
+#### EmbeddingCache ####
+async def async_prune_cached_embeddings(
+    db: AsyncSession,
+    older_than: datetime | None = None,
+    max_rows: int = 0,
+) -> int:
+    """
+    Delete the cached embeddings created before `older_than`, then the oldest ones beyond the `max_rows` newest.
+    Returns the number of deleted entries.
+    """
+    deleted = 0
+    try:
+        if older_than is not None:
+            res = await db.execute(delete(models.EmbeddingCache).where(models.EmbeddingCache.created_at < older_than))
+            deleted += res.rowcount
+        if max_rows > 0:
+            overflow = (
+                select(models.EmbeddingCache.content_hash, models.EmbeddingCache.model)
+                .order_by(models.EmbeddingCache.created_at.desc())
+                .offset(max_rows)
+            )
+            res = await db.execute(
+                delete(models.EmbeddingCache).where(
+                    tuple_(models.EmbeddingCache.content_hash, models.EmbeddingCache.model).in_(overflow)
+                )
+            )
+            deleted += res.rowcount
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return deleted
+
+
 async def async_count_sources(
     db: AsyncSession,
-    id: int | None = None,
-    enrichment_job_id: int | None = None,
-    title: str | None = None,
-    title_like: str | None = None,
-    url: str | None = None,
-    content_like: str | None = None,
-    urls: list[str] | None = None,
-    published_after: datetime | None = None,
-    published_before: datetime | None = None,
+    **filters,
 ) -> int:
-    stmt = select(func.count()).select_from(models.Source)
-    if id:
-        stmt = stmt.filter(models.Source.id == id)
-    if enrichment_job_id:
-        stmt = stmt.filter(models.Source.enrichment_job_id == enrichment_job_id)
-    if title:
-        stmt = stmt.filter(models.Source.title == title)
-    if title_like:
-        stmt = stmt.filter(models.Source.title.ilike(f"%{title_like}%"))
-    if url:
-        stmt = stmt.filter(models.Source.url == url)
-    if content_like:
-        stmt = stmt.filter(models.Source.content.ilike(f"%{content_like}%"))
-    if urls:
-        stmt = stmt.filter(models.Source.url.in_(urls))
-    if published_after:
-        stmt = stmt.filter(models.Source.published_on > published_after)
-    if published_before:
-        stmt = stmt.filter(models.Source.published_on < published_before)
+    """
+    Exact number of sources matching the filters of `async_base_get_source`.
+    """
+    stmt = _filter_sources(select(func.count()).select_from(models.Source), **filters)
     res = await db.execute(stmt)
     return res.scalar() or 0
@@ -1,9 +1,10 @@
 import enum
-from sqlalchemy import Column, ForeignKey, Integer, String, Enum, DateTime, Text, Date, Index
-from sqlalchemy.dialects.postgresql import ARRAY
-from pgvector.sqlalchemy import Vector
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, ForeignKey, Integer, String, Enum, DateTime, Text, Date, Boolean, Index, Computed, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from pgvector.sqlalchemy import Vector, HALFVEC
+from sqlalchemy.orm import relationship, deferred
 
+from src.config import config
 from .database import Base
 
 
@@ -37,11 +38,12 @@ class SourceEmbedding(Base):
     
     source = relationship("Source")
 
+# Half precision index of the embeddings, searched with an exact re-rank (see `vector_index`)
 Index(
-    "sources_embedding_idx",
-    SourceEmbedding.embedding,
+    "sources_embedding_halfvec_idx",
+    func.cast(SourceEmbedding.embedding, HALFVEC(1536)).label("embedding_halfvec"),
     postgresql_using="hnsw",
-    postgresql_ops={"embedding": "public.vector_cosine_ops"},
+    postgresql_ops={"embedding_halfvec": "halfvec_cosine_ops"},
     postgresql_with={"m": "16", "ef_construction": "200"}
 )
 
@@ -54,16 +56,70 @@ class Source(Base):
     type = Column(String, nullable=False, index=True)
 
     title = Column(String, nullable=False)
-    url = Column(String, nullable=False, index=True)
+    url = Column(String, nullable=False, unique=True, index=True)
     content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)
 
     fetched_on = Column(DateTime(timezone=True), nullable=True)
     published_on = Column(Date, nullable=True)
     updated_on = Column(DateTime(timezone=True), nullable=True)
 
+    # 'simple' keeps IOCs such as IPs, hashes and domains as single unstemmed lexemes
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
     iocs = relationship("IOC", back_populates="source")
     enrichment_job = relationship("EnrichmentJob", back_populates="sources")
 
+# Keyset pagination indexes, listings are ordered by (column, id)
+Index("ix_sources_published_on_id", Source.published_on, Source.id)
+Index("ix_sources_updated_on_id", Source.updated_on, Source.id)
+Index("ix_sources_fetched_on_id", Source.fetched_on, Source.id)
+Index("ix_sources_title_id", Source.title, Source.id)
+
+# Keyword search
+Index("ix_sources_search_vector", Source.search_vector, postgresql_using="gin")
+# Substring (ILIKE) filters on title and content
+Index("ix_sources_title_trgm", Source.title, postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"})
+Index("ix_sources_content_trgm", Source.content, postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"})
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String, primary_key=True)
+
+    embedding = Column(Vector(config.embedding_dimensions), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+# Oldest entries first for the retention prune
+Index("ix_embedding_cache_created_at", EmbeddingCache.created_at)
+
+class ArchivePage(Base):
+    """Validators and parsed diary urls of a crawled archive page, used for conditional requests"""
+    __tablename__ = "archive_pages"
+
+    url = Column(String, primary_key=True)  # Including the query string
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=False)
+    urls = Column(ARRAY(String), nullable=False)
+
+    fetched_on = Column(DateTime(timezone=True), nullable=False)
+
+class CronRun(Base):
+    __tablename__ = "cron_runs"
+
+    name = Column(String, primary_key=True)
+    last_fired_at = Column(DateTime(timezone=True), nullable=False)
+
 class EnrichmentJob(Base):
     __tablename__ = "enrichment_jobs"
 
@@ -77,4 +133,27 @@ class EnrichmentJob(Base):
     finished_at = Column(DateTime(timezone=True), nullable=True)
 
     sources = relationship("Source", back_populates="enrichment_job")
+    work_items = relationship("EnrichmentWorkItem", back_populates="enrichment_job")
+
+class EnrichmentWorkItem(Base):
+    """One unit of an enrichment job (e.g. one archive month), claimed by a worker under a lease"""
+    __tablename__ = "enrichment_work_items"
+
+    id = Column(Integer, primary_key=True)
+    enrichment_job_id = Column(Integer, ForeignKey("enrichment_jobs.id"), nullable=False, index=True)
+    status = Column(Enum(JobStatus), nullable=False)
+
+    params = Column(JSONB, nullable=False)
+    recrawl = Column(Boolean, nullable=False, default=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    # A running item whose lease expired is claimed again, its worker is gone
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    enrichment_job = relationship("EnrichmentJob", back_populates="work_items")
 
@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, Integer
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor can not be decoded or does not match the query"""
+
+
+def encode_cursor(payload: dict) -> str:
+    """
+    Encode a keyset position into an opaque, url safe cursor.
+    """
+    data = json.dumps(payload, separators=(",", ":"), default=json_default)
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor created by `encode_cursor`.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    if not isinstance(payload, dict):
+        raise InvalidCursorError("Invalid cursor")
+    return payload
+
+
+def parse_cursor_value(column, value):
+    """
+    Convert a JSON decoded cursor value back to the python type of `column`.
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column.type, Date):
+            return date.fromisoformat(value)
+        if isinstance(column.type, Integer):
+            return int(value)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    return value
+
+
+def json_default(value):
+    """
+    `default` of json.dumps for the dates and datetimes of source rows, serialized as ISO 8601.
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+__all__ = [
+    "InvalidCursorError",
+    "encode_cursor",
+    "decode_cursor",
+    "parse_cursor_value",
+    "json_default",
+]
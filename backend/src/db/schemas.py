@@ -25,11 +25,37 @@ class EnrichmentJob(EnrichmentJobBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
 
+class ArchivePage(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: str
+    urls: List[str]
+    fetched_on: datetime.datetime = Field(default_factory=current_utc_time)
+
+class EnrichmentWorkItemCreate(BaseModel):
+    enrichment_job_id: int
+    params: dict
+    recrawl: bool = False
+    status: JobStatus = JobStatus.PENDING
+
+class EnrichmentWorkItem(EnrichmentWorkItemCreate):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    attempts: int
+    error: Optional[str] = None
+    lease_expires_at: Optional[datetime.datetime] = None
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
 class SourceBase(BaseModel):
     title: str
     type: str
     url: Optional[str] = None
     content: Optional[str] = None
+    content_hash: Optional[str] = None
     fetched_on: Optional[datetime.datetime | None] = None
     published_on: Optional[datetime.date | None] = None
     updated_on: Optional[datetime.datetime | None] = None
@@ -43,6 +69,7 @@ class SourceUpdate(BaseModel):
     type: Optional[str] = None
     url: Optional[str] = None
     content: Optional[str] = None
+    content_hash: Optional[str] = None
     fetched_on: Optional[datetime.datetime | None] = None
     published_on: Optional[datetime.date | None] = None
     updated_on: Optional[datetime.datetime | None] = None
@@ -51,6 +78,18 @@ class Source(SourceBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
 
+class SourceSummary(BaseModel):
+    """Source without its content, for listings"""
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    title: str
+    type: str
+    url: Optional[str] = None
+    fetched_on: Optional[datetime.datetime | None] = None
+    published_on: Optional[datetime.date | None] = None
+    updated_on: Optional[datetime.datetime | None] = None
+    enrichment_job_id: Optional[int | None] = None
+
 class SourceEmbeddingBase(BaseModel):
     source_id: int
     chunk: str
@@ -58,6 +97,11 @@ class SourceEmbeddingBase(BaseModel):
 
 class SourceEmbeddingCreate(SourceEmbeddingBase):
     pass
+
+class SourceEmbeddingChunk(BaseModel):
+    chunk: str
+    embedding: List[float]
+
 class SourceEmbeddingUpdate(BaseModel):
     chunk: Optional[str] = None
     embedding: Optional[List[float]] = None
@@ -73,6 +117,17 @@ class SourceEmbeddingWithDistance(SourceEmbedding):
 class SourceWithDistance(Source):
     distance: float
 
+class SourceSearchResult(SourceSummary):
+    rank: float
+    snippet: Optional[str] = None
+
+class SourceHybridResult(SourceSummary):
+    score: float
+    keyword_rank: Optional[int] = None
+    vector_rank: Optional[int] = None
+    distance: Optional[float] = None
+    snippet: Optional[str] = None
+
 class IOCBase(BaseModel):
     value: str
     tags: Optional[List[str]] = Field(default_factory=list)
@@ -1,9 +1,37 @@
-from src.cron import CronTab
-from .jobs import cron_events
+from warnings import warn
+
+from src.config import config
+from src.cron import CronTab, DatabaseStateStore, MemoryStateStore
+from src.utils.trace import setup_tracing
+from src.utils.metrics import setup_metrics
+from .jobs import cron_events, startup_tasks
+from .http import close_http_client
+from .pool import shutdown_parse_executor
+
+
+# Initialize tracing and metrics
+config.application_name = config.application_name + " - Enrichment"
+
+tracer = setup_tracing()
+meter = setup_metrics()
+
+if config.enable_httpx_telemetry:
+    try:
+        from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+        HTTPXClientInstrumentor().instrument()
+    except ImportError:
+        warn("HTTPXClientInstrumentor not installed. Skipping HTTPX instrumentation.")
 
 
 def app() -> None:
     cron = CronTab(
         *cron_events,
+        state_store=DatabaseStateStore() if config.cron_state_store == "database" else MemoryStateStore(),
+        catch_up=config.cron_catch_up,
+        on_startup=startup_tasks,
+        on_shutdown=[close_http_client],
     )
-    cron.run()
+    try:
+        cron.run()
+    finally:
+        shutdown_parse_executor()
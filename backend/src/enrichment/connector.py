@@ -0,0 +1,487 @@
+"""Source connectors of the enrichment server and their registry"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+from opentelemetry import trace
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import utils
+from src.config import config
+from src.cron import Event
+from src.db import crud, models, schemas
+from src.utils.embeddings import EmbeddingChunk, async_chunk_and_embed_list, async_embed_chunked_list, chunk_text
+from src.enrichment import http
+from src.enrichment.locks import advisory_lock, concurrency_slot
+from src.enrichment.pipeline import Pipeline, PipelineStats, Stage
+from src.enrichment.queue import enqueue_enrichment_job, run_enrichment_job, get_resumable_enrichment_jobs, resume_enrichment_job
+
+
+tracer = trace.get_tracer(__name__)
+
+C = TypeVar("C", bound=type["Connector"])
+
+# Registered connector classes by name
+connectors: dict[str, type["Connector"]] = {}
+
+# Work items queued before connectors were registered by name all belong to the SANS ISC connector
+default_connector = "ics_sans_edu_scraper"
+
+
+class HostLimiter:
+    """
+    Per-host politeness limits: at most `concurrency` requests in flight to a host,
+    and at least `delay` seconds between the start of two requests to the same host.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = config.scraper_per_host_concurrency,
+        delay: float = config.scraper_per_host_delay,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.delay = max(0.0, delay)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._last_request: dict[str, float] = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str) -> AsyncIterator[None]:
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with semaphore:
+            if self.delay:
+                loop = asyncio.get_running_loop()
+                async with lock:
+                    wait = self._last_request.get(host, 0.0) + self.delay - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._last_request[host] = loop.time()
+            yield
+
+
+host_limiter: HostLimiter | None = None
+
+def get_host_limiter() -> HostLimiter:
+    """
+    Create and return the process wide host limiter. Every crawl of every job shares it, so the per
+    host limits hold however many work items run at once.
+    """
+    global host_limiter
+    if host_limiter is None:
+        host_limiter = HostLimiter()
+    return host_limiter
+
+
+class Connector(ABC):
+    """
+    A source of documents crawled by the enrichment server.
+
+    A connector implements the steps specific to its source:
+    - `discover` the document urls of one work item, usually from a listing page fetched with `fetch_listing`,
+    - `extract` a record from a fetched document (`fetch` is a plain GET and rarely needs overriding),
+    - `normalize` the record into a SourceCreate.
+    `run` does the rest the same way for every connector: the dedup by content hash, the bounded
+    fetch -> parse -> chunk -> embed -> persist pipeline and the bulk upsert of the sources.
+
+    A job of a connector is split into work items by `work_items`, each processed by its own instance
+    built from the item's `params`. `schedules` are the cron events of the connector, their kwargs
+    are the name and description of the job and the selection passed to `work_items`. Passing `url`
+    points an instance at another listing page, e.g. a local stand-in server.
+    """
+
+    name: str
+    source_type: str
+    # Listing page of the source, queried with the params of the work item
+    url: str | None = None
+    schedules: list[dict[str, Any]] = []
+
+    def __init__(
+        self,
+        params: dict[str, Any] = {},
+        recrawl: bool = False,
+        url: str | None = None,
+        max_concurrency: int = config.scraper_max_concurrency,
+        host_limiter: HostLimiter | None = None,
+    ) -> None:
+        self.url = url or self.url
+        self.params = params
+        self.recrawl = recrawl
+        self.max_concurrency = max_concurrency
+        self.host_limiter = host_limiter or get_host_limiter()
+        # The listing page fetched by this crawl, None when it was not fetched or did not change
+        self.page_content: str | None = None
+        self.page_urls: list[str] = []
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        # What the previous crawl of the listing page stored, None on the first crawl and when re-crawling
+        self.archive_page: models.ArchivePage | None = None
+
+    @classmethod
+    def work_items(cls, **selection) -> list[dict[str, Any]]:
+        """
+        Params of the work items of a job, one crawl each. A single crawl without params by default.
+        """
+        return [{}]
+
+    @classmethod
+    def cron_events(cls) -> list[Event]:
+        return [
+            Event(
+                action=enrichment_job_async,
+                **{key: value for key, value in schedule.items() if key != "kwargs"},
+                kwargs={"connector": cls.name, **schedule.get("kwargs", {})},
+            )
+            for schedule in cls.schedules
+        ]
+
+    @property
+    def lock_key(self) -> str:
+        """Advisory lock of the crawl, two crawls of the same params take turns"""
+        return f"{self.name}:" + "&".join(f"{key}={value}" for key, value in sorted(self.params.items()))
+
+    @property
+    def page_url(self) -> str:
+        return str(httpx.URL(self.url, params=self.params))
+
+    async def fetch_listing(self, db_session: AsyncSession) -> str | None:
+        """
+        Fetch the listing page `url` with the params of the work item. With a stored archive page the
+        request is conditional, returns None when the page was not modified since the last crawl.
+        """
+        if not self.recrawl:
+            self.archive_page = await crud.async_get_archive_page(db_session, self.page_url)
+
+        headers = {}
+        if self.archive_page is not None:
+            if self.archive_page.etag:
+                headers["If-None-Match"] = self.archive_page.etag
+            if self.archive_page.last_modified:
+                headers["If-Modified-Since"] = self.archive_page.last_modified
+
+        response = await http.get(self.url, params=self.params, headers=headers)
+        print(response.request.url)
+        if response.status_code == 304:
+            print("Listing page not modified since the last crawl.")
+            return None
+        response.raise_for_status()
+        if self.archive_page is not None and self.archive_page.content_hash == utils.content_hash(response.text):
+            # Servers without validators still get the parse and the lookups skipped
+            print("Listing page unchanged since the last crawl.")
+            return None
+
+        self.page_content = response.text
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return self.page_content
+
+    def new_urls(self, urls: list[str]) -> list[str]:
+        """
+        Remember the document urls found on the listing page and return the ones the previous crawl did not see.
+        """
+        self.page_urls = urls
+        if self.archive_page is None:
+            return urls
+        # Documents of the previous crawl are all persisted, only the new ones need a look up
+        known_urls = set(self.archive_page.urls)
+        urls = [url for url in urls if url not in known_urls]
+        print(f"{len(urls)} URLs are new since the last crawl.")
+        return urls
+
+    async def save_listing(self, db_session: AsyncSession) -> None:
+        """
+        Remember the validators and document urls of the fetched listing page for the next conditional crawl.
+        Only called once every document of the page is persisted, a crawl with failures is retried in full.
+        """
+        if self.page_content is None:
+            return
+        await crud.async_upsert_archive_page(
+            db_session,
+            schemas.ArchivePage(
+                url=self.page_url,
+                etag=self.etag,
+                last_modified=self.last_modified,
+                content_hash=utils.content_hash(self.page_content),
+                urls=self.page_urls,
+            ),
+        )
+
+    @abstractmethod
+    async def discover(self, db_session: AsyncSession) -> list[str]:
+        """
+        Urls of the documents to crawl for the params of this instance, an empty list when nothing changed.
+        """
+
+    async def fetch(self, url: str) -> tuple[str, str] | None:
+        """
+        Fetches a single document, returns (url, html) or None if the document could not be fetched.
+        """
+        try:
+            async with self.host_limiter.limit(url):
+                response = await http.get(url)
+            response.raise_for_status()
+            print(f"Fetched document from - {url}")
+            return url, response.text
+        except httpx.HTTPStatusError as e:
+            print(f"Failed to fetch {url}: {e}")
+        except Exception as e:
+            print(f"An error occurred while fetching {url}: {e}")
+        return None
+
+    @abstractmethod
+    async def extract(self, url: str, html: str) -> Any | None:
+        """
+        Extracts a record from a fetched document, None when the document holds none.
+        CPU bound parsing belongs on the parse executor (`run_in_parse_executor`).
+        """
+
+    @abstractmethod
+    def normalize(self, url: str, record: Any) -> schemas.SourceCreate | None:
+        """
+        Converts an extracted record into the source to persist, None to skip it.
+        """
+
+    async def parse(self, url: str, html: str) -> schemas.SourceCreate | None:
+        record = await self.extract(url, html)
+        if record is None:
+            print(f"Nothing to extract from {url}. Skipping...")
+            return None
+        return self.normalize(url, record)
+
+    async def run(
+        self,
+        db_session: AsyncSession,
+        enrichment_job_id: int,
+    ) -> PipelineStats | None:
+        """
+        Crawl the documents found by `discover` and persist the new (or, with `recrawl`, changed) ones.
+
+        The documents stream through fetch -> parse -> chunk -> embed -> persist stages connected by
+        bounded queues, so fetching, parsing, embedding and writing overlap and only the queued documents
+        are held in memory. `db_session` is used by the persist stage alone.
+        """
+        with tracer.start_as_current_span("connector_run") as span:
+            span.set_attribute("connector", self.name)
+            span.set_attribute("params", str(self.params))
+
+            urls = await self.discover(db_session)
+            print(f"{len(urls)} URLs discovered.")
+            if not urls:
+                await self.save_listing(db_session)
+                return None
+
+            # Look up the stored content hashes of the discovered URLs
+            existing_hashes = await crud.async_get_source_content_hashes(
+                db_session,
+                urls=urls,
+            )
+            if existing_hashes and not self.recrawl:
+                print(f"Found {len(existing_hashes)} existing sources in the database.")
+                urls = [url for url in urls if url not in existing_hashes]
+                print(f"Filtered out {len(existing_hashes)} existing URLs.")
+
+            if not urls:
+                print("No new sources found.")
+                await self.save_listing(db_session)
+                return None
+
+            async def parse(fetched: tuple[str, str]) -> schemas.SourceCreate | None:
+                source = await self.parse(*fetched)
+                # Skip re-crawled documents whose body did not change
+                if source is not None and existing_hashes.get(source.url) == source.content_hash:
+                    return None
+                return source
+
+            async def chunk(source: schemas.SourceCreate) -> tuple[schemas.SourceCreate, list[str]]:
+                return source, chunk_text(source.content)
+
+            async def embed(batch: list[tuple[schemas.SourceCreate, list[str]]]) -> list[tuple[schemas.SourceCreate, list[EmbeddingChunk]]]:
+                embeddings = await async_embed_chunked_list([chunks for _, chunks in batch])
+                return [(source, chunks) for (source, _), chunks in zip(batch, embeddings)]
+
+            async def persist(batch: list[tuple[schemas.SourceCreate, list[EmbeddingChunk]]]) -> None:
+                await persist_sources(
+                    db_session,
+                    enrichment_job_id=enrichment_job_id,
+                    sources=[source for source, _ in batch],
+                    embeddings=[chunks for _, chunks in batch],
+                )
+
+            queue_size = config.enrichment_pipeline_queue_size
+            pipeline = Pipeline(
+                Stage("fetch", self.fetch, workers=self.max_concurrency, queue_size=queue_size),
+                Stage("parse", parse, workers=config.scraper_parse_workers or os.cpu_count() or 1, queue_size=queue_size, drop_errors=True),
+                Stage("chunk", chunk, queue_size=queue_size),
+                Stage(
+                    "embed",
+                    embed,
+                    workers=config.enrichment_pipeline_embed_workers,
+                    queue_size=queue_size,
+                    batch_size=config.enrichment_pipeline_embed_batch,
+                    batch_timeout=config.enrichment_pipeline_batch_timeout,
+                    fan_out=True,
+                ),
+                Stage(
+                    "persist",
+                    persist,
+                    queue_size=queue_size,
+                    batch_size=config.enrichment_pipeline_persist_batch,
+                    batch_timeout=config.enrichment_pipeline_batch_timeout,
+                ),
+                name=self.name,
+            )
+            print(f"Streaming {len(urls)} urls...")
+            stats = await pipeline.run(urls)
+            print(f"Pipeline finished in {stats.seconds:.1f}s - {stats}")
+
+            if stats.stages["fetch"].dropped == 0 and not any(stage.failed for stage in stats.stages.values()):
+                await self.save_listing(db_session)
+            return stats
+
+
+def register_connector(connector: C) -> C:
+    """
+    Class decorator adding a connector to the registry under its `name`.
+    """
+    if connector.name in connectors and connectors[connector.name] is not connector:
+        raise ValueError(f"A connector named {connector.name} is already registered")
+    connectors[connector.name] = connector
+    return connector
+
+
+def get_connector(name: str) -> type[Connector]:
+    try:
+        return connectors[name]
+    except KeyError:
+        raise ValueError(f"Unknown connector {name}, registered connectors: {', '.join(connectors)}") from None
+
+
+def enabled_connectors() -> list[type[Connector]]:
+    """
+    The registered connectors scheduled by the enrichment server, every one unless `enrichment_connectors` lists some.
+    """
+    if not config.enrichment_connectors:
+        return list(connectors.values())
+    return [get_connector(name) for name in config.enrichment_connectors]
+
+
+async def persist_sources(
+    db_session: AsyncSession,
+    enrichment_job_id: int,
+    sources: list[schemas.SourceCreate],
+    embeddings: list[list[EmbeddingChunk]] | None = None,
+):
+    """
+    Upsert `sources` with their chunk embeddings, the sources are embedded first when `embeddings` is None.
+    """
+    if not sources:
+        print("No sources to persist.")
+        return
+    print(f"Persisting {len(sources)} sources to the database.")
+
+    if embeddings is None:
+        embeddings = await async_chunk_and_embed_list(
+            [source.content for source in sources]
+        )
+    for source in sources:
+        source.enrichment_job_id = enrichment_job_id
+    written = await crud.async_bulk_upsert_sources_with_embeddings(
+        db_session,
+        sources=sources,
+        embeddings=[
+            [
+                schemas.SourceEmbeddingChunk(chunk=chunk.chunk, embedding=chunk.embedding)
+                for chunk in embedding_chunks
+            ]
+            for embedding_chunks in embeddings
+        ],
+    )
+    print(f"Persisted {len(written)} new or changed sources.")
+
+
+async def crawl_and_persist(
+    db_session: AsyncSession,
+    enrichment_job_id: int,
+    params: dict[str, Any] = {},
+    recrawl: bool = False,
+) -> None:
+    """
+    Work item handler of every connector: crawl the work item with the connector named in its `params`.
+
+    Runs under a per crawl advisory lock, so two jobs crawling the same params take turns and the
+    second one only sees what the first one left, and under one of the `enrichment_max_concurrent_crawls`
+    global slots shared by every connector and every replica.
+    """
+    params = dict(params)
+    connector = get_connector(params.pop("connector", default_connector))(params, recrawl=recrawl)
+    # The crawl lock first, a crawl waiting on another job's crawl of the same params must not hold a slot
+    async with advisory_lock(connector.lock_key), concurrency_slot("enrichment:crawls", config.enrichment_max_concurrent_crawls):
+        await connector.run(db_session, enrichment_job_id)
+
+
+async def enrichment_job_async(
+    connector: str,
+    name: str,
+    description: str,
+    recrawl: bool = False,
+    **selection,
+) -> None:
+    """
+    Crawl and persist the work items `selection` picks from `connector`, `enrichment_job_workers` at a time.
+
+    Runs of the same job never overlap, across every replica: when the previous run of `name`
+    still holds its advisory lock this run is skipped.
+    """
+    async with advisory_lock(f"enrichment_job:{name}", wait=False) as acquired:
+        if not acquired:
+            print(f"Enrichment job - {name} - is still running elsewhere, skipping this run.")
+            return
+        # Finish what an interrupted run of this job left before starting a new one, the startup
+        # resume skips jobs whose lock is busy and would otherwise leave them RUNNING for good
+        for db_job in await get_resumable_enrichment_jobs(name):
+            await resume_enrichment_job(db_job, crawl_and_persist)
+        # One durable work item per crawl, processed concurrently and resumed after a restart
+        db_job = await enqueue_enrichment_job(
+            name=name,
+            description=description,
+            params=[{"connector": connector, **params} for params in get_connector(connector).work_items(**selection)],
+            recrawl=recrawl,
+        )
+        print(f"Enrichment job - {db_job.id} - is running...")
+        await run_enrichment_job(db_job, crawl_and_persist)
+
+
+async def resume_enrichment_jobs_async() -> None:
+    """
+    Resume the jobs left unfinished by a restart. Jobs whose lock is busy, because another replica or
+    a run of the same job holds it, are left alone, the next run of the job resumes them.
+    """
+    async def resume(db_job) -> None:
+        async with advisory_lock(f"enrichment_job:{db_job.name}", wait=False) as acquired:
+            if acquired:
+                await resume_enrichment_job(db_job, crawl_and_persist)
+            else:
+                print(f"Enrichment job - {db_job.id} - is locked by another run of {db_job.name}, leaving it to that run.")
+
+    await asyncio.gather(*[resume(db_job) for db_job in await get_resumable_enrichment_jobs()])
+
+
+__all__ = [
+    "HostLimiter",
+    "get_host_limiter",
+    "Connector",
+    "connectors",
+    "register_connector",
+    "get_connector",
+    "enabled_connectors",
+    "persist_sources",
+    "crawl_and_persist",
+    "enrichment_job_async",
+    "resume_enrichment_jobs_async",
+]
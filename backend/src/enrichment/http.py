@@ -0,0 +1,147 @@
+"""Process wide HTTP client of the enrichment jobs"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from warnings import warn
+
+import httpx
+from opentelemetry import metrics, trace
+
+from src.config import config
+from src import utils
+
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+request_duration = meter.create_histogram(
+    "oracle.http.client.duration",
+    unit="s",
+    description="Duration of the HTTP requests of the enrichment jobs, per host",
+)
+request_retries = meter.create_counter(
+    "oracle.http.client.retries",
+    description="HTTP requests of the enrichment jobs retried after a transient failure, per host",
+)
+
+# Worth retrying: rate limited or a temporarily unavailable upstream
+retry_status_codes = {408, 425, 429, 500, 502, 503, 504}
+
+http_client: httpx.AsyncClient | None = None
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Create and return the process wide HTTP client. Its keep-alive connections are pooled across
+    archive pages, months and jobs, so TLS handshakes are paid once per host instead of once per request batch.
+    The client is bound to the event loop it is first used on.
+    """
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http2 = config.scraper_http2
+        if http2 and not http2_available():
+            warn("HTTP/2 support is not installed, falling back to HTTP/1.1. Install it with `pip install httpx[http2]`")
+            http2 = False
+        http_client = httpx.AsyncClient(
+            http2=http2,
+            follow_redirects=True,
+            headers={"User-Agent": config.scraper_user_agent},
+            limits=httpx.Limits(
+                max_connections=config.scraper_http_max_connections,
+                max_keepalive_connections=config.scraper_http_max_keepalive_connections,
+                keepalive_expiry=config.scraper_http_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                config.scraper_http_timeout,
+                connect=config.scraper_http_connect_timeout,
+            ),
+        )
+    return http_client
+
+
+async def close_http_client() -> None:
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Seconds to wait according to the Retry-After header of `response`, None without one"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - utils.current_utc_time()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int) -> float:
+    """Full jitter exponential backoff, attempt 0 is the first retry"""
+    return random.uniform(0, min(config.scraper_http_backoff_max, config.scraper_http_backoff * 2 ** attempt))
+
+
+async def request(method: str, url: str | httpx.URL, **kwargs) -> httpx.Response:
+    """
+    Send a request with the shared client, retrying connection errors, timeouts and `retry_status_codes`
+    up to `scraper_http_retries` times with jittered exponential backoff (or the server's Retry-After).
+    The last response is returned as is, the caller decides what a non 2xx status means.
+    """
+    client = get_http_client()
+    host = httpx.URL(url).host
+    with tracer.start_as_current_span("http_request") as span:
+        span.set_attribute("http.method", method)
+        span.set_attribute("http.host", host)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                request_duration.record(time.perf_counter() - start, {"host": host, "method": method, "outcome": type(e).__name__})
+                if attempt >= config.scraper_http_retries:
+                    raise
+                delay = backoff(attempt)
+            else:
+                request_duration.record(
+                    time.perf_counter() - start,
+                    {"host": host, "method": method, "status_code": response.status_code, "http_version": response.http_version},
+                )
+                if response.status_code not in retry_status_codes or attempt >= config.scraper_http_retries:
+                    span.set_attribute("http.status_code", response.status_code)
+                    span.set_attribute("retries", attempt)
+                    return response
+                delay = retry_after(response)
+                delay = backoff(attempt) if delay is None else min(delay, config.scraper_http_backoff_max)
+                await response.aclose()
+
+            request_retries.add(1, {"host": host})
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def get(url: str | httpx.URL, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+__all__ = [
+    "get_http_client",
+    "close_http_client",
+    "request",
+    "get",
+]
@@ -1,11 +1,35 @@
+from typing import Awaitable, Callable
+
+from src.config import config
 from src.cron import Event
+from src.enrichment.connector import enabled_connectors, resume_enrichment_jobs_async
+from src.utils.embedding_cache import prune_embedding_cache_async
 
-from .ics_sans_edu_scraper import cron_events as ics_sans_edu_scraper_cron_events
+# Importing a connector module registers its connector
+from . import ics_sans_edu_scraper  # noqa: F401
 
 cron_events: list[Event] = [
-    *ics_sans_edu_scraper_cron_events,
+    event
+    for connector in enabled_connectors()
+    for event in connector.cron_events()
+]
+
+if config.enable_embedding_cache_database:
+    cron_events.append(
+        Event( # Run every day at 03:30
+            action=prune_embedding_cache_async,
+            minute=30,
+            hour=3,
+            name="Embedding cache - Daily prune",
+        )
+    )
+
+# Run once when the enrichment server starts
+startup_tasks: list[Callable[[], Awaitable[None]]] = [
+    resume_enrichment_jobs_async,
 ]
 
 __all__ = [
     "cron_events",
+    "startup_tasks",
 ]
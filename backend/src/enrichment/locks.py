@@ -0,0 +1,84 @@
+"""Postgres advisory locks shared by every enrichment server replica"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from opentelemetry import trace
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.config import config
+from src.db.database import engine
+
+
+tracer = trace.get_tracer(__name__)
+
+
+async def _try_lock(conn: AsyncConnection, key: str) -> bool:
+    res = await conn.execute(text("SELECT pg_try_advisory_lock(hashtextextended(:key, 0))"), {"key": key})
+    await conn.commit()
+    return bool(res.scalar())
+
+
+async def _unlock(conn: AsyncConnection, key: str) -> None:
+    try:
+        await conn.execute(text("SELECT pg_advisory_unlock(hashtextextended(:key, 0))"), {"key": key})
+        await conn.commit()
+    except Exception as e:
+        # Session level locks live as long as the connection, never hand a locked connection back to the pool
+        print(f"Could not release advisory lock {key}: {e}")
+        await conn.invalidate()
+
+
+@asynccontextmanager
+async def advisory_lock(key: str, wait: bool = True) -> AsyncIterator[bool]:
+    """
+    Hold the session level advisory lock `key` on a dedicated connection for the duration of the block.
+
+    With `wait` the lock is polled every `enrichment_lock_poll_interval` seconds until it is free,
+    otherwise the block runs right away and receives False when another process holds the lock.
+    """
+    with tracer.start_as_current_span("advisory_lock") as span:
+        span.set_attribute("key", key)
+        async with engine.connect() as conn:
+            acquired = await _try_lock(conn, key)
+            while not acquired and wait:
+                await asyncio.sleep(config.enrichment_lock_poll_interval)
+                acquired = await _try_lock(conn, key)
+            span.set_attribute("acquired", acquired)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await _unlock(conn, key)
+
+
+@asynccontextmanager
+async def concurrency_slot(namespace: str, slots: int) -> AsyncIterator[int]:
+    """
+    Hold one of `slots` advisory locks of `namespace` for the duration of the block, waiting for one to
+    free up. Caps how many blocks run at once across every replica. Yields the slot number.
+    """
+    with tracer.start_as_current_span("concurrency_slot") as span:
+        span.set_attribute("namespace", namespace)
+        async with engine.connect() as conn:
+            slot = None
+            while slot is None:
+                for i in range(max(1, slots)):
+                    if await _try_lock(conn, f"{namespace}:{i}"):
+                        slot = i
+                        break
+                else:
+                    await asyncio.sleep(config.enrichment_lock_poll_interval)
+            span.set_attribute("slot", slot)
+            try:
+                yield slot
+            finally:
+                await _unlock(conn, f"{namespace}:{slot}")
+
+
+__all__ = [
+    "advisory_lock",
+    "concurrency_slot",
+]
@@ -0,0 +1,233 @@
+"""Streaming pipeline of asyncio stages connected by bounded queues"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+from opentelemetry import metrics, trace
+
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+stage_items = meter.create_counter(
+    "oracle.enrichment.pipeline.items",
+    description="Items that went through a pipeline stage, by outcome (out, dropped, failed)",
+)
+stage_duration = meter.create_histogram(
+    "oracle.enrichment.pipeline.stage.duration",
+    unit="s",
+    description="Time a pipeline stage spent on one item or batch",
+)
+stage_queue_size = meter.create_up_down_counter(
+    "oracle.enrichment.pipeline.queue.size",
+    description="Items waiting in the input queue of a pipeline stage",
+)
+
+# Marks the end of the stream, one per worker of the receiving stage
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a `Pipeline`.
+
+    `func` receives one item, or with `batch_size` a list of up to `batch_size` items (a partial batch is
+    flushed `batch_timeout` seconds after its first item or at the end of the stream). It returns the
+    item to pass on, None to drop it, or with `fan_out` an iterable of items. `workers` calls run at once
+    and the input queue holds `queue_size` items, a full queue blocks the stage before it (backpressure).
+    Errors drop the item when `drop_errors` is set and abort the pipeline otherwise.
+    """
+    name: str
+    func: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    queue_size: int = 16
+    batch_size: int = 0
+    batch_timeout: float = 1.0
+    fan_out: bool = False
+    drop_errors: bool = False
+
+
+@dataclass
+class StageStats:
+    items_in: int = 0
+    items_out: int = 0
+    dropped: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class PipelineStats:
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{name}: {stats.items_in} in / {stats.items_out} out"
+            + (f" / {stats.dropped} dropped" if stats.dropped else "")
+            + (f" / {stats.failed} failed" if stats.failed else "")
+            + f" ({stats.items_in / self.seconds if self.seconds else 0:.1f}/s)"
+            for name, stats in self.stages.items()
+        )
+
+
+class Pipeline:
+    """
+    Runs `stages` concurrently, each stage feeding the next through a bounded queue, so the network,
+    the CPU and the database are busy at the same time and at most the queued items are held in memory.
+    """
+
+    def __init__(self, *stages: Stage, name: str = "pipeline") -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.name = name
+
+    async def _put(self, queue: asyncio.Queue, stage: Stage, item: Any) -> None:
+        await queue.put(item)
+        stage_queue_size.add(1, {"pipeline": self.name, "stage": stage.name})
+
+    async def _get(self, queue: asyncio.Queue, stage: Stage) -> Any:
+        item = await queue.get()
+        if item is not _DONE:
+            stage_queue_size.add(-1, {"pipeline": self.name, "stage": stage.name})
+        return item
+
+    async def _feed(self, items: Iterable | AsyncIterable, queue: asyncio.Queue, stage: Stage) -> None:
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                await self._put(queue, stage, item)
+        else:
+            for item in items:
+                await self._put(queue, stage, item)
+        for _ in range(max(1, stage.workers)):
+            await queue.put(_DONE)
+
+    async def _next_batch(self, queue: asyncio.Queue, stage: Stage) -> tuple[list, bool]:
+        """Collect the next batch, returns (batch, whether the stream ended)"""
+        item = await self._get(queue, stage)
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + stage.batch_timeout
+        while len(batch) < stage.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._get(queue, stage), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _worker(
+        self,
+        stage: Stage,
+        stats: StageStats,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue | None,
+        next_stage: Stage | None,
+    ) -> None:
+        attributes = {"pipeline": self.name, "stage": stage.name}
+        done = False
+        while not done:
+            if stage.batch_size:
+                batch, done = await self._next_batch(inbox, stage)
+                if not batch:
+                    break
+                payload, count = batch, len(batch)
+            else:
+                payload = await self._get(inbox, stage)
+                if payload is _DONE:
+                    break
+                count = 1
+            stats.items_in += count
+
+            start = time.perf_counter()
+            try:
+                result = await stage.func(payload)
+            except Exception as e:
+                if not stage.drop_errors:
+                    raise
+                print(f"Pipeline {self.name} - {stage.name} - dropped {count} item(s): {e}")
+                stats.failed += count
+                stage_items.add(count, {**attributes, "outcome": "failed"})
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.busy_seconds += elapsed
+                stage_duration.record(elapsed, attributes)
+
+            results = [] if result is None else list(result) if stage.fan_out else [result]
+            # The last stage is a sink, its None results are not drops
+            if not results and not stage.fan_out and outbox is not None:
+                stats.dropped += count
+                stage_items.add(count, {**attributes, "outcome": "dropped"})
+            stats.items_out += len(results)
+            stage_items.add(len(results), {**attributes, "outcome": "out"})
+            if outbox is not None:
+                for item in results:
+                    await self._put(outbox, next_stage, item)
+
+    async def _run_stage(
+        self,
+        stage: Stage,
+        stats: StageStats,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue | None,
+        next_stage: Stage | None,
+    ) -> None:
+        await asyncio.gather(*[
+            self._worker(stage, stats, inbox, outbox, next_stage)
+            for _ in range(max(1, stage.workers))
+        ])
+        if outbox is not None:
+            for _ in range(max(1, next_stage.workers)):
+                await outbox.put(_DONE)
+
+    async def run(self, items: Iterable | AsyncIterable) -> PipelineStats:
+        """
+        Push `items` through the stages and wait until the last stage is done. The output of the last
+        stage is discarded, it is expected to persist its items.
+        """
+        with tracer.start_as_current_span(f"pipeline_{self.name}") as span:
+            stats = PipelineStats(stages={stage.name: StageStats() for stage in self.stages})
+            queues = [asyncio.Queue(maxsize=max(1, stage.queue_size)) for stage in self.stages]
+            start = time.perf_counter()
+
+            tasks = [asyncio.create_task(self._feed(items, queues[0], self.stages[0]))]
+            for i, stage in enumerate(self.stages):
+                last = i == len(self.stages) - 1
+                tasks.append(asyncio.create_task(self._run_stage(
+                    stage,
+                    stats.stages[stage.name],
+                    queues[i],
+                    None if last else queues[i + 1],
+                    None if last else self.stages[i + 1],
+                )))
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            finally:
+                stats.seconds = time.perf_counter() - start
+                for name, stage_stats in stats.stages.items():
+                    span.set_attribute(f"{name}.items_in", stage_stats.items_in)
+                    span.set_attribute(f"{name}.items_out", stage_stats.items_out)
+            return stats
+
+
+__all__ = [
+    "Stage",
+    "Pipeline",
+    "PipelineStats",
+]
@@ -0,0 +1,56 @@
+"""Executor for the CPU bound parts of the enrichment jobs (HTML parsing)"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from src.config import config
+
+
+T = TypeVar("T")
+
+parse_executor: Executor | None = None
+
+
+def get_parse_executor() -> Executor:
+    """
+    Create and return the process wide parse executor.
+    A process pool is used by default, `scraper_parse_executor="thread"` switches to a thread pool,
+    which only pays off together with a parser that releases the GIL such as lxml.
+    """
+    global parse_executor
+    if parse_executor is None:
+        max_workers = config.scraper_parse_workers or os.cpu_count() or 1
+        if config.scraper_parse_executor == "process":
+            parse_executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            parse_executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="oracle-parse",
+            )
+    return parse_executor
+
+
+async def run_in_parse_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run `func` on the parse executor without blocking the event loop.
+    With the process pool, `func`, its arguments and its result must be picklable.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_parse_executor() -> None:
+    global parse_executor
+    if parse_executor is not None:
+        parse_executor.shutdown(wait=False, cancel_futures=True)
+        parse_executor = None
+
+
+__all__ = [
+    "get_parse_executor",
+    "run_in_parse_executor",
+    "shutdown_parse_executor",
+]
@@ -0,0 +1,191 @@
+"""Durable work queue of the enrichment jobs, backed by the `enrichment_work_items` table"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from opentelemetry import metrics, trace
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import utils
+from src.config import config
+from src.db import crud, models, schemas
+from src.db.database import SessionLocal
+
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+work_item_duration = meter.create_histogram(
+    "oracle.enrichment.work_item.duration",
+    unit="s",
+    description="Time spent processing one enrichment work item",
+)
+
+# Processes one work item: (session, enrichment job id, params, recrawl)
+WorkItemHandler = Callable[[AsyncSession, int, dict, bool], Awaitable[None]]
+
+
+async def _renew_lease(work_item_id: int) -> None:
+    """Keep extending the lease of a work item while it is processed"""
+    while True:
+        await asyncio.sleep(config.enrichment_work_item_lease / 3)
+        db = SessionLocal()
+        try:
+            await crud.async_renew_enrichment_work_item_lease(db, work_item_id, config.enrichment_work_item_lease)
+        except Exception as e:
+            print(f"Could not renew the lease of work item {work_item_id}: {e}")
+        finally:
+            await db.close()
+
+
+async def _worker(enrichment_job_id: int, handler: WorkItemHandler) -> None:
+    """Claim and process the work items of a job until none is left"""
+    db = SessionLocal()
+    try:
+        while True:
+            work_item = await crud.async_claim_enrichment_work_item(
+                db,
+                enrichment_job_id,
+                lease_seconds=config.enrichment_work_item_lease,
+                max_attempts=config.enrichment_work_item_max_attempts,
+            )
+            if work_item is None:
+                return
+
+            heartbeat = asyncio.create_task(_renew_lease(work_item.id))
+            start = time.perf_counter()
+            with tracer.start_as_current_span("enrichment_work_item") as span:
+                span.set_attribute("work_item_id", work_item.id)
+                span.set_attribute("params", str(work_item.params))
+                span.set_attribute("attempt", work_item.attempts)
+                try:
+                    await handler(db, enrichment_job_id, work_item.params, work_item.recrawl)
+                except Exception as e:
+                    await db.rollback()
+                    retry = work_item.attempts < config.enrichment_work_item_max_attempts
+                    status = models.JobStatus.PENDING if retry else models.JobStatus.FAILED
+                    print(f"Enrichment job - {enrichment_job_id} - work item {work_item.params} failed (attempt {work_item.attempts}): {e}")
+                    span.record_exception(e)
+                    await crud.async_finish_enrichment_work_item(db, work_item.id, status, error=repr(e))
+                else:
+                    status = models.JobStatus.COMPLETED
+                    await crud.async_finish_enrichment_work_item(db, work_item.id, status)
+                finally:
+                    heartbeat.cancel()
+
+            elapsed = time.perf_counter() - start
+            work_item_duration.record(elapsed, {"status": status.value})
+            print(f"Enrichment job - {enrichment_job_id} - work item {work_item.params} {status.value} in {elapsed:.1f}s.")
+    finally:
+        await db.close()
+
+
+async def run_enrichment_job(db_job: models.EnrichmentJob, handler: WorkItemHandler) -> None:
+    """
+    Process the work items of a job with `enrichment_job_workers` concurrent workers, then mark the job
+    COMPLETED when every item completed and FAILED otherwise. The caller must hold the job's lock.
+    """
+    with tracer.start_as_current_span("run_enrichment_job") as span:
+        span.set_attribute("enrichment_job_id", db_job.id)
+        # A worker that dies (e.g. the database dropped while finishing an item) must not keep the job
+        # from being finalized, its claimed item is failed below with the other unfinished ones
+        results = await asyncio.gather(*[
+            _worker(db_job.id, handler)
+            for _ in range(max(1, config.enrichment_job_workers))
+        ], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Enrichment job - {db_job.id} - a worker stopped: {result}")
+                span.record_exception(result)
+
+        db = SessionLocal()
+        try:
+            await crud.async_fail_unfinished_enrichment_work_items(db, db_job.id)
+            counts = await crud.async_count_enrichment_work_items(db, db_job.id)
+            failed = counts.get(models.JobStatus.FAILED, 0)
+            status = models.JobStatus.FAILED if failed else models.JobStatus.COMPLETED
+            span.set_attribute("failed_work_items", failed)
+
+            await crud.async_base_update_enrichment_job(
+                db,
+                db_job,
+                schemas.EnrichmentJobUpdate(
+                    status=status,
+                    finished_at=utils.current_utc_time(),
+                ),
+            )
+        finally:
+            await db.close()
+        print(f"Enrichment job - {db_job.id} - {status.value}, {failed} of {sum(counts.values())} work items failed.")
+
+
+async def enqueue_enrichment_job(
+    name: str,
+    description: str,
+    params: list[dict],
+    recrawl: bool = False,
+) -> models.EnrichmentJob:
+    """
+    Create a RUNNING job with one PENDING work item per entry of `params`.
+    """
+    db = SessionLocal()
+    try:
+        db_job = await crud.async_base_create_enrichment_job(
+            db,
+            schemas.EnrichmentJobCreate(
+                name=name,
+                description=description,
+                status=schemas.JobStatus.RUNNING,
+                started_at=utils.current_utc_time(),
+            ),
+        )
+        await crud.async_bulk_create_enrichment_work_items(
+            db,
+            [
+                schemas.EnrichmentWorkItemCreate(
+                    enrichment_job_id=db_job.id,
+                    params=item_params,
+                    recrawl=recrawl,
+                )
+                for item_params in params
+            ],
+        )
+    finally:
+        await db.close()
+    return db_job
+
+
+async def get_resumable_enrichment_jobs(name: str | None = None) -> list[models.EnrichmentJob]:
+    db = SessionLocal()
+    try:
+        return await crud.async_get_resumable_enrichment_jobs(db, name=name)
+    finally:
+        await db.close()
+
+
+async def resume_enrichment_job(db_job: models.EnrichmentJob, handler: WorkItemHandler) -> None:
+    """
+    Resume a job interrupted by a restart: its running items lost their workers and are requeued.
+    The caller must hold the job's lock.
+    """
+    db = SessionLocal()
+    try:
+        requeued = await crud.async_requeue_enrichment_work_items(
+            db,
+            db_job.id,
+            max_attempts=config.enrichment_work_item_max_attempts,
+        )
+    finally:
+        await db.close()
+    print(f"Enrichment job - {db_job.id} - resuming, {requeued} interrupted work items requeued.")
+    await run_enrichment_job(db_job, handler)
+
+
+__all__ = [
+    "WorkItemHandler",
+    "enqueue_enrichment_job",
+    "run_enrichment_job",
+    "get_resumable_enrichment_jobs",
+    "resume_enrichment_job",
+]
@@ -3,11 +3,13 @@ from mcp.server import FastMCP
 from opentelemetry import trace
 from datetime import datetime, date, timedelta, time
 import json
+from typing import Literal
 
 from src.config import config
 from src.db import schemas, crud
 from src.db.database import SessionLocal
-from src.utils.embeddings import async_get_embedding
+from src.utils.cache import TTLCache
+from src.utils.embeddings import async_get_query_embedding, normalize_query
 from src.utils.trace import setup_tracing
 from src.utils.metrics import setup_metrics
 
@@ -20,133 +22,182 @@ meter = setup_metrics()
 
 app = FastMCP()
 
+# Keyed on (normalized query, limit, profile, sources version), so persisting sources invalidates the entries.
+# Hybrid search entries are prefixed with "hybrid".
+search_result_cache = TTLCache(
+    maxsize=config.search_result_cache_size,
+    ttl=config.search_result_cache_ttl,
+)
+
+summary_fields = list(schemas.SourceSummary.model_fields)
+
+def to_source_models(sources, summary: bool) -> list[schemas.Source] | list[schemas.SourceSummary]:
+    if summary:
+        # Only the summary columns were loaded, build the models without re-validating them
+        return [
+            schemas.SourceSummary.model_construct(**{field: getattr(s, field) for field in summary_fields})
+            for s in sources
+        ]
+    return [schemas.Source.model_validate(s) for s in sources]
+
+
+@app.tool()
+async def get_source(source_id: int) -> schemas.Source | None:
+    """
+        Retrieves a single source, including its full content, by its id. Use it to read the sources returned in summary mode by the other tools.
+    """
+    with tracer.start_as_current_span("get_source") as span:
+        span.set_attribute("source_id", source_id)
+        db = SessionLocal()
+        try:
+            sources = await crud.async_base_get_source(db=db, id=source_id, limit=1)
+        finally:
+            await db.close()
+        return schemas.Source.model_validate(sources[0]) if sources else None
 
 @app.tool()
-async def get_today_sources() -> list[schemas.Source]:
+async def get_today_sources(
+    summary: bool = False,
+    limit: int = 100,
+) -> list[schemas.Source] | list[schemas.SourceSummary]:
     """
-        Retrieves a list of sources that have been published or updated today. This tool helps you quickly access all sources relevant to the current day. These sources may contain possible Indicators of Compromise (IOCs) useful for threat detection and response.
+        Retrieves a list of sources that have been published or updated today, most recent first. This tool helps you quickly access all sources relevant to the current day. These sources may contain possible Indicators of Compromise (IOCs) useful for threat detection and response. With summary=true the content of the sources is left out, use get_source to read a source. At most limit sources are returned.
     """
     with tracer.start_as_current_span("get_today_sources") as span:
+        span.set_attribute("summary", summary)
+        span.set_attribute("limit", limit)
         today = date.today()
-        start_of_today = datetime.combine(today, time.min)
-        end_of_today = datetime.combine(today, time.max)
 
         db = SessionLocal()
         try:
-            sources = await crud.async_base_get_source(
+            sources = await crud.async_get_sources_published_or_updated(
                 db=db,
-                published_after=start_of_today,
-                published_before=end_of_today + timedelta(seconds=1),
-                order_by="published_on",
-                asc=False,
-            )
-            updated_sources = await crud.async_base_get_source(
-                db=db,
-                updated_after=start_of_today,
-                updated_before=end_of_today + timedelta(seconds=1),
-                order_by="updated_on",
-                asc=False,
+                since=datetime.combine(today, time.min),
+                until=datetime.combine(today, time.max),
+                limit=limit,
+                fields=summary_fields if summary else None,
             )
         finally:
             await db.close()
 
-        all_sources = {s.id: s for s in sources}
-        for s in updated_sources:
-            all_sources[s.id] = s
-        # Convert to schemas.Source
-        return [schemas.Source.model_validate(s) for s in all_sources.values()]
+        return to_source_models(sources, summary)
 
 @app.tool()
 async def get_last_n_days_sources(
-    last_n_days: int = 7
-) -> list[schemas.Source]:
+    last_n_days: int = 7,
+    summary: bool = False,
+    limit: int = 100,
+) -> list[schemas.Source] | list[schemas.SourceSummary]:
 
     """
-        Retrieves a list of sources that have been published or updated within the last n days. This tool helps you quickly access all sources relevant to the current day. These sources may contain possible Indicators of Compromise (IOCs) useful for threat detection and response.
+        Retrieves a list of sources that have been published or updated within the last n days, most recent first. This tool helps you quickly access all sources relevant to the current day. These sources may contain possible Indicators of Compromise (IOCs) useful for threat detection and response. With summary=true the content of the sources is left out, use get_source to read a source. At most limit sources are returned.
     """
     with tracer.start_as_current_span("get_last_n_days_sources") as span:
         span.set_attribute("last_n_days", last_n_days)
+        span.set_attribute("summary", summary)
+        span.set_attribute("limit", limit)
         today = date.today()
-        start_of_range = datetime.combine(today - timedelta(days=last_n_days - 1), time.min)
-        end_of_today = datetime.combine(today, time.max)
 
         db = SessionLocal()
         try:
-            published_sources = await crud.async_base_get_source(
-                db=db,
-                published_after=start_of_range,
-                published_before=end_of_today + timedelta(seconds=1),
-                order_by="published_on",
-                asc=False,
-            )
-            updated_sources = await crud.async_base_get_source(
+            sources = await crud.async_get_sources_published_or_updated(
                 db=db,
-                updated_after=start_of_range,
-                updated_before=end_of_today + timedelta(seconds=1),
-                order_by="updated_on",
-                asc=False,
+                since=datetime.combine(today - timedelta(days=last_n_days - 1), time.min),
+                until=datetime.combine(today, time.max),
+                limit=limit,
+                fields=summary_fields if summary else None,
             )
         finally:
             await db.close()
 
-        all_sources = {s.id: s for s in published_sources}
-        for s in updated_sources:
-            all_sources[s.id] = s
-        # Convert to schemas.Source
-        return [schemas.Source.model_validate(s) for s in all_sources.values()]
+        return to_source_models(sources, summary)
 
 
 
 @app.tool()
 async def search_sources(
     query: str,
-    limit: int = 10
+    limit: int = 10,
+    profile: Literal["fast", "balanced", "accurate"] = config.vector_search_profile,
 ) -> list[schemas.SourceWithDistance]:
     """
-        Performs a similarity search on the source embeddings to find relevant sources based on a query string. This tool helps you find sources that are similiar to the query, which may contain possible Indicators of Compromise (IOCs) useful for threat detection and response.
+        Performs a similarity search on the source embeddings to find relevant sources based on a query string. This tool helps you find sources that are similiar to the query, which may contain possible Indicators of Compromise (IOCs) useful for threat detection and response. The profile trades recall for latency: "fast", "balanced" or "accurate".
     """
     with tracer.start_as_current_span("search_sources") as span:
         span.set_attribute("query", query)
         span.set_attribute("limit", limit)
+        span.set_attribute("profile", profile)
         db = SessionLocal()
         try:
-            query_embedding = await async_get_embedding(query)
-
-            sources = await crud.async_similarity_search_source_embedding(
+            cache_key = None
+            if config.search_result_cache_ttl > 0:
+                sources_version = await crud.async_get_sources_version(db)
+                cache_key = (normalize_query(query), limit, profile, sources_version)
+                cached_sources = search_result_cache.get(cache_key)
+                span.set_attribute("result_cache_hit", cached_sources is not None)
+                if cached_sources is not None:
+                    return cached_sources
+
+            query_embedding = await async_get_query_embedding(query)
+
+            sources = await crud.async_similarity_search_sources(
                 db=db,
                 query_embedding=query_embedding,
-                limit=limit*5,  # Retrieve more than the limit to handle deduplication
+                limit=limit,
+                profile=profile,
             )
         finally:
             await db.close()
 
-        validated_sources: list[schemas.SourceWithDistance] = []
-        for s in sources:
-            model = schemas.Source.model_validate(s[0].source)
-            model = schemas.SourceWithDistance(
-                **model.model_dump(), distance=s[1]
+        # Sources come back deduplicated and ranked by their average chunk distance
+        validated_sources = [schemas.SourceWithDistance(**source) for source in sources]
+
+        if cache_key is not None:
+            search_result_cache.put(cache_key, validated_sources)
+        return validated_sources
+
+
+@app.tool()
+async def hybrid_search_sources(
+    query: str,
+    limit: int = 10,
+    profile: Literal["fast", "balanced", "accurate"] = config.vector_search_profile,
+) -> list[schemas.SourceHybridResult]:
+    """
+        Searches the sources by keywords and by similarity at once and returns a single ranked list. Prefer this tool over search_sources when looking for exact strings such as Indicators of Compromise (IOCs) like IP addresses, domains or file hashes. Results contain a snippet of the matching content instead of the full content, use get_source to read a source.
+    """
+    with tracer.start_as_current_span("hybrid_search_sources") as span:
+        span.set_attribute("query", query)
+        span.set_attribute("limit", limit)
+        span.set_attribute("profile", profile)
+        keyword_db = SessionLocal()
+        vector_db = SessionLocal()
+        try:
+            cache_key = None
+            if config.search_result_cache_ttl > 0:
+                sources_version = await crud.async_get_sources_version(keyword_db)
+                cache_key = ("hybrid", normalize_query(query), limit, profile, sources_version)
+                cached_sources = search_result_cache.get(cache_key)
+                span.set_attribute("result_cache_hit", cached_sources is not None)
+                if cached_sources is not None:
+                    return cached_sources
+
+            query_embedding = await async_get_query_embedding(query)
+
+            sources = await crud.async_hybrid_search_sources(
+                keyword_db=keyword_db,
+                vector_db=vector_db,
+                query=query,
+                query_embedding=query_embedding,
+                limit=limit,
+                profile=profile,
             )
-            validated_sources.append(model)
-
-        # deduplicate sources by id and compute average distance correctly
-        distance_accumulator: dict[int, tuple[schemas.SourceWithDistance, float, int]] = {}
-        for source in validated_sources:
-            if source.id not in distance_accumulator:
-                distance_accumulator[source.id] = (source, source.distance, 1)
-            else:
-                existing_source, total_distance, count = distance_accumulator[source.id]
-                distance_accumulator[source.id] = (existing_source, total_distance + source.distance, count + 1)
-
-        # Compute average distance for each unique source
-        unique_sources: list[schemas.SourceWithDistance] = []
-        for source_id, (source, total_distance, count) in distance_accumulator.items():
-            avg_distance = total_distance / count
-            unique_sources.append(schemas.SourceWithDistance(
-                **source.model_dump(exclude="distance"), distance=avg_distance
-            ))
-        # Sort by distance
-        unique_sources.sort(key=lambda x: x.distance)
-        # Apply the limit
-        validated_sources = unique_sources[:limit]
+        finally:
+            await keyword_db.close()
+            await vector_db.close()
+
+        validated_sources = [schemas.SourceHybridResult(**source) for source in sources]
 
+        if cache_key is not None:
+            search_result_cache.put(cache_key, validated_sources)
         return validated_sources
@@ -1,5 +1,6 @@
 from datetime import timezone, datetime
 from functools import wraps
+import hashlib
 
 
 def singleton(cls):
@@ -32,3 +33,9 @@ def run_once(
 
 def current_utc_time() -> datetime:
     return datetime.now(tz=timezone.utc)
+
+def content_hash(text: str) -> str:
+    """
+    Hex encoded sha256 of a text. Matches `encode(sha256(convert_to(text, 'UTF8')), 'hex')` in Postgres.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Minimal in-process least recently used cache.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    """
+    Least recently used cache whose entries also expire `ttl` seconds after they were stored.
+    """
+
+    _missing = object()
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        entry = super().get(key, self._missing)
+        if entry is self._missing:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def put(self, key, value) -> None:
+        if self.ttl <= 0:
+            return
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, self._missing) is not self._missing
+
+
+__all__ = [
+    "LRUCache",
+    "TTLCache",
+]
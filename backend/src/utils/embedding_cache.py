@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from opentelemetry import metrics, trace
+
+from src.config import config
+from src.utils import current_utc_time
+from src.utils.cache import LRUCache
+
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+embedding_cache_hits = meter.create_counter(
+    "oracle.embedding_cache.hits",
+    description="Number of embeddings served from the embedding cache",
+)
+embedding_cache_misses = meter.create_counter(
+    "oracle.embedding_cache.misses",
+    description="Number of embeddings missing from the embedding cache",
+)
+
+
+class EmbeddingCache:
+    """
+    Content addressed embedding cache. Entries are keyed on (model key, sha256 of the text) and looked up
+    in an in-process LRU first, then in the `embedding_cache` table. The model key comes from
+    `EmbeddingProvider.model_key`, `persistent=False` keeps the embeddings of a provider out of the table.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = config.embedding_cache_size,
+        use_database: bool = config.enable_embedding_cache_database,
+    ) -> None:
+        self.memory = LRUCache(maxsize)
+        self.use_database = use_database
+
+    def get_many_from_memory(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        for h in hashes:
+            embedding = self.memory.get((model, h))
+            if embedding is not None:
+                found[h] = embedding
+        if found:
+            embedding_cache_hits.add(len(found), {"tier": "memory", "model": model})
+        return found
+
+    @tracer.start_as_current_span("embedding_cache_get_many")
+    async def get_many(self, model: str, hashes: list[str], persistent: bool = True) -> dict[str, list[float]]:
+        """
+        Return the cached embeddings of `hashes`, missing hashes are left out of the result.
+        """
+        found = self.get_many_from_memory(model, hashes)
+        # Repeated chunks share one lookup and count as one miss
+        missing = [h for h in dict.fromkeys(hashes) if h not in found]
+
+        if missing and self.use_database and persistent:
+            from src.db import crud
+            from src.db.database import SessionLocal
+
+            db = SessionLocal()
+            try:
+                stored = await crud.async_get_cached_embeddings(db, model, missing)
+            except Exception as e:
+                print(f"Embedding cache lookup failed: {e}")
+                stored = {}
+            finally:
+                await db.close()
+
+            if stored:
+                embedding_cache_hits.add(len(stored), {"tier": "database", "model": model})
+            for h, embedding in stored.items():
+                self.memory.put((model, h), embedding)
+            found.update(stored)
+            missing = [h for h in missing if h not in stored]
+
+        if missing:
+            embedding_cache_misses.add(len(missing), {"model": model})
+        return found
+
+    def put_many_in_memory(self, model: str, embeddings: dict[str, list[float]]) -> None:
+        for h, embedding in embeddings.items():
+            self.memory.put((model, h), embedding)
+
+    @tracer.start_as_current_span("embedding_cache_put_many")
+    async def put_many(self, model: str, embeddings: dict[str, list[float]], persistent: bool = True) -> None:
+        """
+        Store hash -> embedding pairs in both tiers.
+        """
+        self.put_many_in_memory(model, embeddings)
+        if not embeddings or not self.use_database or not persistent:
+            return
+
+        from src.db import crud
+        from src.db.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            await crud.async_bulk_create_cached_embeddings(db, model, embeddings)
+        except Exception as e:
+            print(f"Embedding cache write failed: {e}")
+        finally:
+            await db.close()
+
+
+embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Create and return the process wide embedding cache.
+    """
+    global embedding_cache
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache()
+    return embedding_cache
+
+
+@tracer.start_as_current_span("prune_embedding_cache_async")
+async def prune_embedding_cache_async() -> None:
+    """
+    Apply the retention policy of the `embedding_cache` table: drop the entries older than
+    `embedding_cache_database_max_age` days, then the oldest beyond `embedding_cache_database_max_rows`.
+    """
+    from src.db import crud
+    from src.db.database import SessionLocal
+
+    older_than = None
+    if config.embedding_cache_database_max_age > 0:
+        older_than = current_utc_time() - timedelta(days=config.embedding_cache_database_max_age)
+
+    db = SessionLocal()
+    try:
+        deleted = await crud.async_prune_cached_embeddings(db, older_than, config.embedding_cache_database_max_rows)
+        print(f"Embedding cache pruned - {deleted} entries deleted.")
+    finally:
+        await db.close()
+
+
+__all__ = [
+    "EmbeddingCache",
+    "get_embedding_cache",
+    "prune_embedding_cache_async",
+]
@@ -1,11 +1,21 @@
 import asyncio
+import hashlib
+import math
+import random
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
+import openai
 from openai import OpenAI
 from openai import AsyncOpenAI
 from opentelemetry import trace
 import os
 
 from src.config import config
+from src.utils import content_hash
+from src.utils.cache import TTLCache
+from src.utils.embedding_cache import get_embedding_cache
 
 
 tracer = trace.get_tracer(__name__)
@@ -13,7 +23,12 @@ tracer = trace.get_tracer(__name__)
 openai_client: OpenAI | None = None
 async_openai_client: AsyncOpenAI | None = None
 
-default_embedding_model = "text-embedding-3-small"
+default_embedding_models = {
+    "openai": "text-embedding-3-small",
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+    "stub": "stub-hashing",
+}
+default_embedding_model = config.embedding_model or default_embedding_models[config.embedding_provider]
 
 ### Helper functions for OpenAI embeddings ###
 @tracer.start_as_current_span("get_openai_client")
@@ -35,15 +50,302 @@ async def get_async_openai_client() -> AsyncOpenAI:
     """
     global async_openai_client
     if async_openai_client is None:
-        async_openai_client = AsyncOpenAI(api_key=config.openai_api_key if config.openai_api_key else os.getenv("OPENAI_API_KEY"))
+        # The EmbeddingBatcher retries on its own, client retries would multiply its attempts
+        async_openai_client = AsyncOpenAI(
+            api_key=config.openai_api_key if config.openai_api_key else os.getenv("OPENAI_API_KEY"),
+            max_retries=0,
+        )
     return async_openai_client
 
 
+try:
+    import tiktoken
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    tokenizer = None
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text. Uses tiktoken when it is installed,
+    otherwise a conservative estimate of one token per three characters.
+    """
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 3) + 1
+
+
+class EmbeddingBatcher:
+    """
+    Packs texts into embedding requests sized by the per request input and token limits,
+    runs at most `max_concurrency` requests at once across every caller of the instance, retries rate
+    limited and transient failures with exponential backoff, and returns the embeddings in input order.
+    """
+
+    retryable_errors = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+    def __init__(
+        self,
+        max_inputs: int = config.embedding_batch_max_inputs,
+        max_tokens: int = config.embedding_batch_max_tokens,
+        max_concurrency: int = config.embedding_max_concurrency,
+        max_retries: int = config.embedding_max_retries,
+    ) -> None:
+        self.max_inputs = max(1, max_inputs)
+        self.max_tokens = max(1, max_tokens)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        # Shared by every concurrent async_embed call, so the cap holds process wide
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def pack(self, texts: list[str]) -> list[list[int]]:
+        """
+        Split the indices of `texts` into consecutive batches that respect the input and token limits.
+        """
+        batches: list[list[int]] = []
+        batch: list[int] = []
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if batch and (len(batch) >= self.max_inputs or batch_tokens + tokens > self.max_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Seconds to wait before the next attempt, the server's retry-after header wins over exponential backoff with jitter.
+        """
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                return float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        return min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def async_embed(self, texts: list[str], model: str = default_embedding_model) -> list[list[float]]:
+        client = await get_async_openai_client()
+        results: list[list[float] | None] = [None] * len(texts)
+
+        async def run_batch(batch: list[int]) -> None:
+            attempt = 0
+            while True:
+                try:
+                    async with self.semaphore:
+                        response = await client.embeddings.create(
+                            input=[texts[i] for i in batch],
+                            model=model
+                        )
+                    break
+                except self.retryable_errors as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self.backoff(attempt, e)
+                    print(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+            for i, data in zip(batch, response.data):
+                results[i] = data.embedding
+
+        with tracer.start_as_current_span("embedding_batcher_async_embed") as span:
+            batches = self.pack(texts)
+            span.set_attribute("texts", len(texts))
+            span.set_attribute("batches", len(batches))
+            await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return results
+
+embedding_batcher: EmbeddingBatcher | None = None
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """
+    Create and return the process wide embedding batcher.
+    """
+    global embedding_batcher
+    if embedding_batcher is None:
+        embedding_batcher = EmbeddingBatcher()
+    return embedding_batcher
+
+### Embedding providers ###
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into embedding vectors of `dimensions` floats.
+    Switching providers changes the vector space, stored sources must be re-embedded afterwards.
+    """
+
+    name: str
+    # Whether the embeddings may be written to the embedding_cache table shared by every process
+    persistent: bool = True
+
+    def __init__(self, dimensions: int = config.embedding_dimensions) -> None:
+        self.dimensions = dimensions
+
+    def model_key(self, model: str) -> str:
+        """
+        Key of the embeddings of `model` in the embedding caches. Two providers never share a key,
+        even when they are asked for the same model name.
+        """
+        return f"{self.name}:{model}:{self.dimensions}"
+
+    @abstractmethod
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        ...
+
+    async def async_embed(self, texts: list[str], model: str) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed, texts, model)
+
+    def fit_dimensions(self, embedding: list[float]) -> list[float]:
+        """
+        Zero pad or truncate a vector to `dimensions`. Zero padding keeps cosine distances unchanged.
+        """
+        if len(embedding) >= self.dimensions:
+            return list(embedding[:self.dimensions])
+        return list(embedding) + [0.0] * (self.dimensions - len(embedding))
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Remote embeddings from the OpenAI API, the async path goes through the EmbeddingBatcher.
+    """
+
+    name = "openai"
+
+    def model_key(self, model: str) -> str:
+        # The bare model name, the key of the entries cached before there were other providers
+        return model
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        client = get_openai_client()
+        response = client.embeddings.create(
+            input=texts,
+            model=model
+        )
+        return [data.embedding for data in response.data]
+
+    async def async_embed(self, texts: list[str], model: str) -> list[list[float]]:
+        return await get_embedding_batcher().async_embed(texts, model=model)
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU embeddings from a sentence-transformers model, run on a small worker pool off the event loop.
+    Requires `pip install sentence-transformers`.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        dimensions: int = config.embedding_dimensions,
+        workers: int = config.local_embedding_workers,
+    ) -> None:
+        super().__init__(dimensions)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="oracle-embed")
+        self.models: dict = {}
+
+    def get_model(self, model: str):
+        if model not in self.models:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "sentence-transformers is not installed. Please install it with `pip install sentence-transformers`"
+                )
+            self.models[model] = SentenceTransformer(model, device="cpu")
+        return self.models[model]
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        embeddings = self.get_model(model).encode(
+            texts,
+            batch_size=64,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return [self.fit_dimensions(embedding.tolist()) for embedding in embeddings]
+
+    async def async_embed(self, texts: list[str], model: str) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.embed, texts, model)
+
+class StubEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic, offline embeddings for tests and benchmarks. Tokens are hashed into a signed
+    bag of words vector, so texts sharing tokens end up close to each other.
+    Its embeddings are only cached in memory, they must never reach the shared embedding_cache table.
+    """
+
+    name = "stub"
+    persistent = False
+    token_pattern = re.compile(r"[\w.:/-]+")
+
+    def embed(self, texts: list[str], model: str) -> list[list[float]]:
+        return [self.embed_one(text) for text in texts]
+
+    async def async_embed(self, texts: list[str], model: str) -> list[list[float]]:
+        return self.embed(texts, model)
+
+    def embed_one(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for token in self.token_pattern.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if value & (1 << 63) else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            # Cosine distance is undefined for the zero vector
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+embedding_provider: EmbeddingProvider | None = None
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """
+    Create and return the embedding provider selected by `embedding_provider`.
+    """
+    global embedding_provider
+    if embedding_provider is None:
+        if config.embedding_provider == "local":
+            embedding_provider = LocalEmbeddingProvider()
+        elif config.embedding_provider == "stub":
+            embedding_provider = StubEmbeddingProvider()
+        else:
+            embedding_provider = OpenAIEmbeddingProvider()
+    return embedding_provider
+
+def set_embedding_provider(provider: EmbeddingProvider) -> None:
+    """
+    Replace the process wide embedding provider, e.g. with a StubEmbeddingProvider in tests.
+    """
+    global embedding_provider
+    embedding_provider = provider
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100) -> list[str]:
+    """
+    Split a text into chunks of `chunk_size` characters, consecutive chunks overlap by `overlap` characters.
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        chunks.append(text[start:end])
+        start += chunk_size - overlap
+    return chunks
+
+
 ### Exported functions ###
 @tracer.start_as_current_span("get_embedding")
 def get_embedding(text: str, model: str = default_embedding_model) -> list[float]:
     """
-    Get the embedding for a given text using OpenAI's API.
+    Get the embedding for a given text using the configured embedding provider.
 
     Args:
         text (str): The text to embed.
@@ -52,34 +354,39 @@ def get_embedding(text: str, model: str = default_embedding_model) -> list[float
     Returns:
         list[float]: The embedding vector as a list of floats.
     """
-    client = get_openai_client()
-    response = client.embeddings.create(
-        input=text,
-        model=model
-    )
-    return response.data[0].embedding
+    return get_embeddings([text], model=model)[0]
 
 @tracer.start_as_current_span("get_embeddings")
 def get_embeddings(texts: list[str], model: str = default_embedding_model) -> list[list[float]]:
     """
-    Get embeddings for a list of texts using OpenAI's API.
+    Get embeddings for a list of texts using the configured embedding provider.
+    Texts found in the in-process embedding cache are not embedded again.
     Args:
         texts (list[str]): The list of texts to embed.
         model (str): The model to use for embedding. Defaults to default_embedding_model.
     Returns:
         list[list[float]]: A list of embedding vectors, each as a list of floats.
     """
-    client = get_openai_client()
-    response = client.embeddings.create(
-        input=texts,
-        model=model
-    )
-    return [data.embedding for data in response.data]
+    provider = get_embedding_provider()
+    cache = get_embedding_cache()
+    key = provider.model_key(model)
+    hashes = [content_hash(text) for text in texts]
+    cached = cache.get_many_from_memory(key, hashes)
+
+    # Embed each distinct uncached text once
+    missing: dict[str, str] = {h: text for h, text in zip(hashes, texts) if h not in cached}
+    if missing:
+        embeddings = provider.embed(list(missing.values()), model=model)
+        fresh = dict(zip(missing.keys(), embeddings))
+        cache.put_many_in_memory(key, fresh)
+        cached.update(fresh)
+
+    return [cached[h] for h in hashes]
 
 @tracer.start_as_current_span("async_get_embedding")
 async def async_get_embedding(text: str, model: str = default_embedding_model) -> list[float]:
     """
-    Asynchronously get the embedding for a given text using OpenAI's API.
+    Asynchronously get the embedding for a given text using the configured embedding provider.
 
     Args:
         text (str): The text to embed.
@@ -88,29 +395,67 @@ async def async_get_embedding(text: str, model: str = default_embedding_model) -
     Returns:
         list[float]: The embedding vector as a list of floats.
     """
-    client = await get_async_openai_client()
-    response = await client.embeddings.create(
-        input=text,
-        model=model
-    )
-    return response.data[0].embedding
+    return (await async_get_embeddings([text], model=model))[0]
 
 @tracer.start_as_current_span("async_get_embeddings")
 async def async_get_embeddings(texts: list[str], model: str = default_embedding_model) -> list[list[float]]:
     """
-    Asynchronously get embeddings for a list of texts using OpenAI's API.
+    Asynchronously get embeddings for a list of texts using the configured embedding provider.
+    Texts found in the embedding cache (in-process LRU, then the embedding_cache table) are not sent to the API,
+    the rest is embedded by the configured EmbeddingProvider.
     Args:
         texts (list[str]): The list of texts to embed.
         model (str): The model to use for embedding. Defaults to default_embedding_model.
     Returns:
         list[list[float]]: A list of embedding vectors, each as a list of floats.
     """
-    client = await get_async_openai_client()
-    response = await client.embeddings.create(
-        input=texts,
-        model=model
-    )
-    return [data.embedding for data in response.data]
+    provider = get_embedding_provider()
+    cache = get_embedding_cache()
+    key = provider.model_key(model)
+    hashes = [content_hash(text) for text in texts]
+    cached = await cache.get_many(key, hashes, persistent=provider.persistent)
+
+    # Embed each distinct uncached text once
+    missing: dict[str, str] = {h: text for h, text in zip(hashes, texts) if h not in cached}
+    if missing:
+        embeddings = await provider.async_embed(list(missing.values()), model=model)
+        fresh = dict(zip(missing.keys(), embeddings))
+        await cache.put_many(key, fresh, persistent=provider.persistent)
+        cached.update(fresh)
+
+    return [cached[h] for h in hashes]
+
+query_embedding_cache = TTLCache(
+    maxsize=config.query_embedding_cache_size,
+    ttl=config.query_embedding_cache_ttl,
+)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so that near identical queries share one embedding.
+    """
+    return " ".join(query.lower().split())
+
+@tracer.start_as_current_span("async_get_query_embedding")
+async def async_get_query_embedding(query: str, model: str = default_embedding_model) -> list[float]:
+    """
+    Asynchronously get the embedding of a search query. The query is normalized first and its embedding
+    is kept in an in-process TTL cache keyed on (provider model key, normalized query).
+
+    Args:
+        query (str): The search query.
+        model (str): The model to use for embedding. Defaults to default_embedding_model.
+
+    Returns:
+        list[float]: The embedding vector as a list of floats.
+    """
+    normalized = normalize_query(query)
+    key = (get_embedding_provider().model_key(model), normalized)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await async_get_embedding(normalized, model=model)
+        query_embedding_cache.put(key, embedding)
+    return embedding
 
 class EmbeddingChunk(BaseModel):
     chunk: str
@@ -135,13 +480,7 @@ def chunk_and_embed(
     Returns:
         list[dict]: A list of dictionaries containing the chunk and its embedding.
     """
-    # Chunk the text
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
+    chunks = chunk_text(text, chunk_size, overlap)
 
     # Get embeddings for each chunk
     embeddings = get_embeddings(chunks, model=model)
@@ -167,14 +506,7 @@ async def async_chunk_and_embed(
     Returns:
         list[dict]: A list of dictionaries containing the chunk and its embedding.
     """
-
-    # Chunk the text
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
+    chunks = chunk_text(text, chunk_size, overlap)
 
     # Get embeddings for each chunk
     embeddings = await async_get_embeddings(chunks, model=model)
@@ -200,6 +532,36 @@ async def async_chunk_and_embed_list(
     Returns:
         list[list[dict]]: A list of lists, each containing dictionaries with the chunk and its embedding.
     """
-    return await asyncio.gather(
-        *(async_chunk_and_embed(text, chunk_size, overlap, model) for text in texts)
+    chunked_texts = [chunk_text(text, chunk_size, overlap) for text in texts]
+    return await async_embed_chunked_list(chunked_texts, model=model)
+
+@tracer.start_as_current_span("async_embed_chunked_list")
+async def async_embed_chunked_list(
+    chunked_texts: list[list[str]],
+    model: str = default_embedding_model
+) -> list[list[EmbeddingChunk]]:
+    """
+    Asynchronously get embeddings for texts that are already chunked (see chunk_text).
+
+    Args:
+        chunked_texts (list[list[str]]): The chunks of each text.
+        model (str): The model to use for embedding. Defaults to default_embedding_model.
+
+    Returns:
+        list[list[EmbeddingChunk]]: The chunks of each text with their embedding.
+    """
+    # Chunks of all texts share the batched requests, then get scattered back to their text
+    embeddings = await async_get_embeddings(
+        [chunk for chunks in chunked_texts for chunk in chunks],
+        model=model,
     )
+
+    results: list[list[EmbeddingChunk]] = []
+    offset = 0
+    for chunks in chunked_texts:
+        results.append([
+            EmbeddingChunk(chunk=chunk, embedding=embedding)
+            for chunk, embedding in zip(chunks, embeddings[offset:offset + len(chunks)])
+        ])
+        offset += len(chunks)
+    return results
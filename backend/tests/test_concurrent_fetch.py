@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from src.db import crud
+from src.enrichment import connector, http, pool
+from src.enrichment.connector import HostLimiter
+from src.enrichment.jobs.ics_sans_edu_scraper import SansEduScraper
+from src.utils.embeddings import EmbeddingChunk
+
+
+def archive_page(diaries: list[int]) -> str:
+    cards = "".join(
+        f'<div class="isc-card"><div class="card-body"><h2 class="card-title"><a href="/diary/{n}">Diary {n}</a></h2></div></div>'
+        for n in diaries
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+def diary_page(n: int) -> str:
+    return (
+        "<html><body><article>"
+        f"<h1>Diary {n}</h1>"
+        f'<div class="diaryheader">Published: 2025-01-{n:02d}. Last Updated: 2025-01-{n:02d} 10:00:00 UTC</div>'
+        f'<div class="diarybody">Body of diary {n}</div>'
+        "</article></body></html>"
+    )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: "StandInServer"
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        self.server.request_started(path)
+        try:
+            if path == "/diaryarchive.html":
+                status, body = 200, archive_page(self.server.archive)
+            elif path.startswith("/diary/") and int(path.rsplit("/", 1)[1]) in self.server.diaries:
+                time.sleep(self.server.latency)
+                status, body = 200, diary_page(int(path.rsplit("/", 1)[1]))
+            else:
+                status, body = 404, "Not found"
+        finally:
+            self.server.request_finished(path)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Local stand-in for isc.sans.edu: serves an archive page listing `archive` and the diary pages of
+    `diaries`, and records the diary requests in flight and their start times.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, archive: list[int], diaries: list[int] | None = None, latency: float = 0.05) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.archive = archive
+        self.diaries = set(archive if diaries is None else diaries)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started: list[float] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/diaryarchive.html"
+
+    def request_started(self, path: str) -> None:
+        if path.startswith("/diary/"):
+            with self.lock:
+                self.started.append(time.monotonic())
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self, path: str) -> None:
+        if path.startswith("/diary/"):
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def serve():
+    servers: list[StandInServer] = []
+
+    def serve(*args, **kwargs) -> StandInServer:
+        server = StandInServer(*args, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def persisted(monkeypatch) -> dict[str, list]:
+    """
+    Runs the crawl without a database: the lookups find nothing and the sources and archive pages
+    that would be written are collected instead, embedded with zero vectors.
+    """
+    written: dict[str, list] = {"sources": [], "archive_pages": []}
+
+    async def get_source_content_hashes(db, urls):
+        return {}
+
+    async def upsert_archive_page(db, archive_page):
+        written["archive_pages"].append(archive_page)
+
+    async def embed_chunked_list(chunked_texts, model=None):
+        return [[EmbeddingChunk(chunk=chunk, embedding=[0.0]) for chunk in chunks] for chunks in chunked_texts]
+
+    async def persist_sources(db_session, enrichment_job_id, sources, embeddings=None):
+        written["sources"].extend(sources)
+
+    monkeypatch.setattr(crud, "async_get_source_content_hashes", get_source_content_hashes)
+    monkeypatch.setattr(crud, "async_upsert_archive_page", upsert_archive_page)
+    monkeypatch.setattr(connector, "async_embed_chunked_list", embed_chunked_list)
+    monkeypatch.setattr(connector, "persist_sources", persist_sources)
+    # A fresh client per test, the shared one is bound to the event loop it was created on
+    monkeypatch.setattr(http, "http_client", None)
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pool, "parse_executor", executor)
+    yield written
+    executor.shutdown()
+
+
+def make_scraper(server: StandInServer, concurrency: int = 4, delay: float = 0.0) -> SansEduScraper:
+    return SansEduScraper(
+        {"year": 2025, "month": 1},
+        recrawl=True,
+        url=server.url,
+        host_limiter=HostLimiter(concurrency=concurrency, delay=delay),
+    )
+
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await http.close_http_client()
+    return asyncio.run(main())
+
+
+def test_discover_keeps_the_archive_order(serve, persisted):
+    server = serve(archive=[5, 3, 4, 1, 2])
+    urls = run(make_scraper(server).discover(None))
+    base = server.url.rsplit("/", 1)[0]
+    assert urls == [f"{base}/diary/{n}" for n in (5, 3, 4, 1, 2)]
+
+
+def test_run_caps_concurrency_per_host(serve, persisted):
+    server = serve(archive=list(range(1, 9)))
+    run(make_scraper(server, concurrency=2).run(None, enrichment_job_id=1))
+    assert len(persisted["sources"]) == 8
+    assert server.max_in_flight == 2
+
+
+def test_run_spaces_requests_to_a_host(serve, persisted):
+    server = serve(archive=list(range(1, 6)), latency=0.01)
+    run(make_scraper(server, concurrency=4, delay=0.1).run(None, enrichment_job_id=1))
+    started = sorted(server.started)
+    assert len(started) == 5
+    assert all(later - earlier >= 0.09 for earlier, later in zip(started, started[1:]))
+
+
+def test_run_persists_one_record_per_diary(serve, persisted):
+    server = serve(archive=[3, 1, 2])
+    stats = run(make_scraper(server).run(None, enrichment_job_id=1))
+
+    base = server.url.rsplit("/", 1)[0]
+    records = {source.url: source for source in persisted["sources"]}
+    assert sorted(records) == [f"{base}/diary/{n}" for n in (1, 2, 3)]
+    for n in (1, 2, 3):
+        record = records[f"{base}/diary/{n}"]
+        assert record.title == f"Diary {n}"
+        assert record.content == f"Body of diary {n}"
+        assert record.published_on == date(2025, 1, n)
+    assert stats.stages["persist"].items_in == 3
+    # The archive page is remembered with its diaries in page order
+    [saved] = persisted["archive_pages"]
+    assert saved.urls == [f"{base}/diary/{n}" for n in (3, 1, 2)]
+
+
+def test_run_with_a_missing_diary_does_not_save_the_archive_page(serve, persisted):
+    server = serve(archive=[1, 2, 3], diaries=[1, 3])
+    stats = run(make_scraper(server).run(None, enrichment_job_id=1))
+    assert sorted(source.title for source in persisted["sources"]) == ["Diary 1", "Diary 3"]
+    assert stats.stages["fetch"].dropped == 1
+    assert persisted["archive_pages"] == []
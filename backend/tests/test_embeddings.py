@@ -0,0 +1,72 @@
+import asyncio
+import math
+
+import pytest
+
+from src.db import crud
+from src.utils import content_hash, embedding_cache, embeddings
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embeddings import StubEmbeddingProvider, async_get_embeddings, default_embedding_model
+
+
+@pytest.fixture
+def stub(monkeypatch) -> StubEmbeddingProvider:
+    provider = StubEmbeddingProvider(dimensions=32)
+    monkeypatch.setattr(embeddings, "embedding_provider", provider)
+    return provider
+
+
+@pytest.fixture
+def cache(monkeypatch) -> EmbeddingCache:
+    cache = EmbeddingCache(maxsize=100, use_database=True)
+    monkeypatch.setattr(embedding_cache, "embedding_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def database_calls(monkeypatch) -> list[str]:
+    calls: list[str] = []
+
+    async def get_cached_embeddings(db, model, hashes):
+        calls.append("get")
+        return {}
+
+    async def create_cached_embeddings(db, model, embeddings):
+        calls.append("create")
+
+    monkeypatch.setattr(crud, "async_get_cached_embeddings", get_cached_embeddings)
+    monkeypatch.setattr(crud, "async_bulk_create_cached_embeddings", create_cached_embeddings)
+    return calls
+
+
+def test_stub_embeddings_are_deterministic():
+    provider = StubEmbeddingProvider(dimensions=32)
+    texts = ["CVE-2024-3400 exploited in the wild", "Scanning for 203.0.113.7:8080"]
+    assert provider.embed(texts, default_embedding_model) == StubEmbeddingProvider(dimensions=32).embed(texts, default_embedding_model)
+    assert provider.embed(texts[:1], default_embedding_model) != provider.embed(texts[1:], default_embedding_model)
+
+
+def test_stub_embeddings_have_the_provider_dimensions():
+    provider = StubEmbeddingProvider(dimensions=32)
+    for embedding in provider.embed(["phishing kit", ""], default_embedding_model):
+        assert len(embedding) == 32
+        assert math.isclose(math.sqrt(sum(v * v for v in embedding)), 1.0)
+
+
+def test_async_get_embeddings_with_the_stub(stub, cache, database_calls):
+    texts = ["mirai variant", "cobalt strike beacon", "mirai variant"]
+    embedded: list[str] = []
+    embed = stub.embed
+    stub.embed = lambda batch, model: embedded.extend(batch) or embed(batch, model)
+    results = asyncio.run(async_get_embeddings(texts))
+
+    assert sorted(embedded) == ["cobalt strike beacon", "mirai variant"]
+
+    assert results == embed(texts, default_embedding_model)
+    # The stub's vectors are cached in memory under its own key only, never in the shared table
+    key = stub.model_key(default_embedding_model)
+    assert key != default_embedding_model
+    for text in texts:
+        assert (key, content_hash(text)) in cache.memory
+        assert (default_embedding_model, content_hash(text)) not in cache.memory
+    assert database_calls == []
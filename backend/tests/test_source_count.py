@@ -0,0 +1,16 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import psycopg
+
+from src.db import crud, models
+
+
+def test_explain_statement_expands_the_urls_filter():
+    urls = ["https://isc.sans.edu/diary/1", "https://isc.sans.edu/diary/2"]
+    stmt = crud._filter_sources(select(models.Source.id), urls=urls, title_like="Scan")
+    sql, params = crud._explain_statement(stmt, psycopg.dialect())
+
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "POSTCOMPILE" not in sql
+    assert sorted(value for value in params.values() if value in urls) == urls
+    # Every parameter is a plain pyformat placeholder of the statement
+    assert all(f"%({name})s" in sql for name in params)
@@ -62,6 +62,8 @@ const SourcesView: React.FC<SourcesViewProps> = ({ apiBaseUrl }) => {
       offset: ((page - 1) * PAGE_SIZE).toString(),
       order_by: "published_on",
       asc: "false",
+      // The total comes back in the X-Total-Count header, estimated unless a search narrows it down
+      total: debouncedSearch ? "exact" : "estimated",
     });
     // Only use content_like for searching
     if (debouncedSearch) {
@@ -77,6 +79,7 @@ const SourcesView: React.FC<SourcesViewProps> = ({ apiBaseUrl }) => {
     fetch(`${API_URL}?${params.toString()}`)
       .then((res) => {
         if (!res.ok) throw new Error("Failed to fetch sources");
+        setTotal(Number(res.headers.get("X-Total-Count")) || 0);
         return res.json();
       })
       .then((data) => {
@@ -89,17 +92,6 @@ const SourcesView: React.FC<SourcesViewProps> = ({ apiBaseUrl }) => {
       });
   }, [page, debouncedSearch, buildApiParams, API_URL]);
 
-  useEffect(() => {
-    const params = buildApiParams();
-    fetch(`${API_URL}/count?${params.toString()}`)
-      .then((res) => {
-        if (!res.ok) throw new Error("Failed to fetch source count");
-        return res.json();
-      })
-      .then((data) => setTotal(data.count || 0))
-      .catch(() => setTotal(0));
-  }, [debouncedSearch, page, buildApiParams, API_URL]);
-
   // Refetch handler
   const handleRefetch = () => {
     setLoading(true);
@@ -108,6 +100,7 @@ const SourcesView: React.FC<SourcesViewProps> = ({ apiBaseUrl }) => {
     fetch(`${API_URL}?${params.toString()}`)
       .then((res) => {
         if (!res.ok) throw new Error("Failed to fetch sources");
+        setTotal(Number(res.headers.get("X-Total-Count")) || 0);
         return res.json();
       })
       .then((data) => {
@@ -118,13 +111,6 @@ const SourcesView: React.FC<SourcesViewProps> = ({ apiBaseUrl }) => {
         setError(err.message);
         setLoading(false);
       });
-    fetch(`${API_URL}/count?${params.toString()}`)
-      .then((res) => {
-        if (!res.ok) throw new Error("Failed to fetch source count");
-        return res.json();
-      })
-      .then((data) => setTotal(data.count || 0))
-      .catch(() => setTotal(0));
   };
 
   const totalPages = Math.ceil(total / PAGE_SIZE);